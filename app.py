@@ -60,24 +60,9 @@ class UserSummary(db.Model):
     entry_count = db.Column(db.Integer)
     tag_count   = db.Column(db.Integer)
 
-# inisialisasi db (with setup view sql untuk user stats)
-with app.app_context():
-    db.create_all()
-    db.session.execute(text('DROP VIEW IF EXISTS user_summary CASCADE;'))
-    db.session.execute(text('''
-        CREATE OR REPLACE VIEW user_summary AS
-        SELECT
-            u.id               AS user_id,
-            u.username         AS username,
-            COUNT(DISTINCT e.id)   AS entry_count,
-            COUNT(DISTINCT t.id)   AS tag_count
-        FROM users u
-        LEFT JOIN entries e      ON u.id = e.user_id AND e.active = true
-        LEFT JOIN entry_tags et  ON e.id = et.entry_id
-        LEFT JOIN tags t         ON et.tag_id = t.id
-        GROUP BY u.id;
-    '''))
-    db.session.commit()
+# skema db (tabel, index, view user_summary) sekarang diurus migration di app/migrations.py:
+#   flask --app run db-migrate
+# jangan bikin/drop tabel atau view di sini lagi.
 
 # auth: login required before accessing
 from functools import wraps
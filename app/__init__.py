@@ -1,7 +1,7 @@
 from flask import Flask
 from dotenv import load_dotenv
 import os
-from .db import close_db
+from .db import close_db, mark_write
 
 load_dotenv()
 
@@ -9,16 +9,41 @@ def create_app():
     app = Flask(__name__)
     app.secret_key = os.environ.get('SECRET_KEY', 'kunci_rahasia_default_ganti_nanti')
 
+    app.after_request(mark_write)
     app.teardown_appcontext(close_db)
 
+    from app import stream
+    app.before_request(stream.ensure_listener)
+
+    from app import metrics
+    metrics.init_app(app)
+
     from app.routes.auth import auth_bp
     from app.routes.main import main_bp
     from app.routes.entries import entries_bp
     from app.routes.profile import profile_bp
-    
+    from app.routes.ops import ops_bp
+    from app.routes.api import api_bp
+
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(entries_bp)
     app.register_blueprint(profile_bp)
+    app.register_blueprint(ops_bp)
+    app.register_blueprint(api_bp)
+
+    from app.search import reindex_command
+    from app.counters import reconcile_command
+    from app.tracks import backfill_command
+    from app.migrations import migrate_command, check_command
+    from app.export import export_command
+    from app.importer import import_command
+    app.cli.add_command(reindex_command)
+    app.cli.add_command(reconcile_command)
+    app.cli.add_command(backfill_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(check_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(import_command)
 
     return app
\ No newline at end of file
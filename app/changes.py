@@ -0,0 +1,87 @@
+import os
+import json
+import socket
+
+# feed perubahan entries di dalam proses ini.
+# route yang nulis ke tabel entries manggil publish() SETELAH commit,
+# struktur in-process (spatial index, dll) tinggal subscribe().
+#
+# biar worker/instance lain ikut tau, route juga manggil notify() SEBELUM commit:
+# event-nya ikut transaksi (pg_notify baru kekirim pas commit, ilang kalau rollback),
+# terus app/stream.py di tiap worker LISTEN & nerusin ke dispatch().
+#
+# write massal (import, arsip semua, hapus akun) gak ngirim event per baris: lewat
+# COALESCE_OVER baris cukup satu event `reset`, subscriber buang state-nya & bangun ulang.
+CHANNEL = 'entry_changes'
+NOTIFY_BATCH = 40  # event per NOTIFY, payload maksimal ~8000 byte
+COALESCE_OVER = 100
+RESET = {'kind': 'reset'}
+
+_subscribers = []
+
+def subscribe(fn):
+    _subscribers.append(fn)
+    return fn
+
+def origin():
+    # penanda proses pengirim, biar listener gak ngeproses ulang event-nya sendiri
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def make_event(kind, row, old=None):
+    # kind: added / edited / archived / restored / deleted
+    # row: hasil RETURNING (id, user_id, latitude, longitude, pin_color, active)
+    event = {
+        'kind': kind,
+        'id': row['id'],
+        'user_id': row.get('user_id'),
+        'active': bool(row.get('active')) and kind != 'deleted',
+        'lat': row.get('latitude'),
+        'lon': row.get('longitude'),
+        'pin_color': row.get('pin_color'),
+    }
+    if old is not None:
+        event['old_lat'] = old.get('latitude')
+        event['old_lon'] = old.get('longitude')
+    return event
+
+def dispatch(event):
+    for fn in list(_subscribers):
+        try:
+            fn(event)
+        except Exception as e:
+            print(f"Entry change hook error: {e}")
+
+def publish(kind, row, old=None):
+    event = make_event(kind, row, old)
+    dispatch(event)
+    return event
+
+def publish_rows(kind, rows):
+    if len(rows) > COALESCE_OVER:
+        publish_reset()
+        return
+    for row in rows:
+        publish(kind, row)
+
+def publish_reset():
+    dispatch(dict(RESET))
+
+def notify(cur, kind, rows, old=None):
+    # rows di-NOTIFY per NOTIFY_BATCH dalam satu statement
+    if len(rows) > COALESCE_OVER:
+        notify_reset(cur)
+        return
+    _send(cur, [make_event(kind, row, old) for row in rows])
+
+def notify_reset(cur):
+    _send(cur, [dict(RESET)])
+
+def _send(cur, events):
+    if not events:
+        return
+    sender = origin()
+    payloads = [
+        json.dumps({'origin': sender, 'events': events[i:i + NOTIFY_BATCH]}, separators=(',', ':'), default=str)
+        for i in range(0, len(events), NOTIFY_BATCH)
+    ]
+    cur.execute('SELECT pg_notify(%s, p) FROM unnest(%s::text[]) AS p', (CHANNEL, payloads))
@@ -0,0 +1,146 @@
+import os
+import math
+import threading
+from collections import Counter
+from app import changes
+
+MAX_LAT = 85.05112878
+
+
+def project(lat, lon):
+    # lat/lon -> koordinat web mercator ternormalisasi [0, 1]
+    lat = max(min(lat, MAX_LAT), -MAX_LAT)
+    x = (lon + 180.0) / 360.0
+    s = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, y
+
+def unproject(x, y):
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+class ClusterIndex:
+    # clustering grid per zoom level ala supercluster: di zoom z satu sel lebarnya
+    # radius_px di layar, jadi sel zoom z+1 selalu nested di sel zoom z.
+    # tiap sel nyimpen [count, sum_x, sum_y, sum_id, Counter(pin_color)],
+    # jadi nambah/hapus titik cukup update satu sel per level.
+    def __init__(self, min_zoom=0, max_zoom=13, radius_px=60, tile_px=256):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cell = [radius_px / (tile_px * 2 ** z) for z in range(max_zoom + 1)]
+        self.levels = [{} for _ in range(max_zoom + 1)]
+        self.points = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def _key(self, z, x, y):
+        size = self.cell[z]
+        return (int(x / size), int(y / size))
+
+    def add(self, entry_id, lat, lon, pin_color=None):
+        with self.lock:
+            self.remove(entry_id)
+            x, y = project(lat, lon)
+            self.points[entry_id] = (x, y, pin_color)
+            for z in range(self.min_zoom, self.max_zoom + 1):
+                c = self.levels[z].get(self._key(z, x, y))
+                if c is None:
+                    c = self.levels[z][self._key(z, x, y)] = [0, 0.0, 0.0, 0, Counter()]
+                c[0] += 1
+                c[1] += x
+                c[2] += y
+                c[3] += entry_id
+                c[4][pin_color] += 1
+
+    def remove(self, entry_id):
+        with self.lock:
+            old = self.points.pop(entry_id, None)
+            if old is None:
+                return False
+            x, y, pin_color = old
+            for z in range(self.min_zoom, self.max_zoom + 1):
+                key = self._key(z, x, y)
+                c = self.levels[z][key]
+                c[0] -= 1
+                if c[0] == 0:
+                    del self.levels[z][key]
+                    continue
+                c[1] -= x
+                c[2] -= y
+                c[3] -= entry_id
+                c[4][pin_color] -= 1
+                if c[4][pin_color] <= 0:
+                    del c[4][pin_color]
+            return True
+
+    def query(self, bbox, zoom):
+        # -> (clusters, single_ids). bbox sama formatnya kayak geo.parse_bbox
+        z = max(self.min_zoom, min(int(zoom), self.max_zoom))
+        level = self.levels[z]
+        clusters, singles = [], []
+        with self.lock:
+            keys = set()
+            for min_lon, min_lat, max_lon, max_lat in bbox:
+                x0, y0 = self._key(z, *project(max_lat, min_lon))
+                x1, y1 = self._key(z, *project(min_lat, max_lon))
+                if (x1 - x0 + 1) * (y1 - y0 + 1) > len(level):
+                    keys.update(k for k in level if x0 <= k[0] <= x1 and y0 <= k[1] <= y1)
+                else:
+                    keys.update((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in level)
+
+            for key in keys:
+                count, sx, sy, sid, colors = level[key]
+                if count == 1:
+                    # sel isi satu titik: sum_id ya id-nya sendiri
+                    singles.append(sid)
+                    continue
+                lat, lon = unproject(sx / count, sy / count)
+                clusters.append({
+                    'id': f'{z}/{key[0]}/{key[1]}',
+                    'latitude': lat,
+                    'longitude': lon,
+                    'count': count,
+                    'pin_color': colors.most_common(1)[0][0] if colors else None
+                })
+        return clusters, singles
+
+
+_clusters = None
+_source = None
+_build_lock = threading.Lock()
+
+def max_zoom():
+    return int(os.environ.get('MAP_CLUSTER_MAX_ZOOM', 13))
+
+def radius_px():
+    return int(os.environ.get('MAP_CLUSTER_RADIUS', 60))
+
+def cell_size(z):
+    return radius_px() / (256 * 2 ** z)
+
+def get_clusters(index):
+    # cluster dibangun dari titik-titik geo.GridIndex, di-rebuild tiap kali index-nya di-reload
+    global _clusters, _source
+    if _source is index:
+        return _clusters
+    with _build_lock:
+        if _source is not index:
+            clusters = ClusterIndex(max_zoom=max_zoom(), radius_px=radius_px())
+            with index.lock:
+                for entry_id, (lat, lon, pin_color) in index.points.items():
+                    clusters.add(entry_id, lat, lon, pin_color)
+            _clusters, _source = clusters, index
+    return _clusters
+
+@changes.subscribe
+def _on_entry_change(event):
+    if _clusters is None or event['kind'] == 'reset':
+        return  # reset: index geo dibangun ulang, cluster ikut
+    if event['active'] and event['lat'] is not None and event['lon'] is not None:
+        _clusters.add(event['id'], float(event['lat']), float(event['lon']), event['pin_color'])
+    else:
+        _clusters.remove(event['id'])
@@ -0,0 +1,197 @@
+import click
+from flask.cli import with_appcontext
+from app import pagecache
+
+# counter statistik yang di-maintain trigger PostgreSQL, jadi ikut transaksi write-nya:
+#   app_counters   -> total_stories (entry aktif), total_writers (user dengan >= 1 entry aktif)
+#   user_stats     -> entry_count & tag_count (tag unik di entry aktif) per user
+#   user_tag_uses  -> berapa entry aktif user yang pake tag itu (buat ngitung tag_count)
+# (app_counters.entries_generation bukan dari trigger, itu di-bump route, lihat app/pagecache.py)
+SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS app_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+ALTER TABLE app_counters ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+INSERT INTO app_counters (name) VALUES ('total_stories'), ('total_writers'), ('entries_generation') ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    tag_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_tag_uses (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    tag_id INTEGER REFERENCES tags(id) ON DELETE CASCADE,
+    uses INTEGER NOT NULL,
+    PRIMARY KEY (user_id, tag_id)
+);
+
+CREATE OR REPLACE FUNCTION counters_bump_entries(uid INTEGER, delta INTEGER) RETURNS void AS $$
+DECLARE
+    before_count INTEGER;
+BEGIN
+    INSERT INTO user_stats (user_id) VALUES (uid) ON CONFLICT (user_id) DO NOTHING;
+    UPDATE user_stats SET entry_count = entry_count + delta
+     WHERE user_id = uid RETURNING entry_count - delta INTO before_count;
+    UPDATE app_counters SET value = value + delta WHERE name = 'total_stories';
+    IF before_count = 0 AND delta > 0 THEN
+        UPDATE app_counters SET value = value + 1 WHERE name = 'total_writers';
+    ELSIF before_count > 0 AND before_count + delta <= 0 THEN
+        UPDATE app_counters SET value = value - 1 WHERE name = 'total_writers';
+    END IF;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION counters_bump_tag(uid INTEGER, tid INTEGER, delta INTEGER) RETURNS void AS $$
+DECLARE
+    after_uses INTEGER;
+BEGIN
+    INSERT INTO user_tag_uses (user_id, tag_id, uses) VALUES (uid, tid, 0) ON CONFLICT DO NOTHING;
+    UPDATE user_tag_uses SET uses = uses + delta
+     WHERE user_id = uid AND tag_id = tid RETURNING uses INTO after_uses;
+    INSERT INTO user_stats (user_id) VALUES (uid) ON CONFLICT (user_id) DO NOTHING;
+    IF after_uses <= 0 THEN
+        DELETE FROM user_tag_uses WHERE user_id = uid AND tag_id = tid;
+        UPDATE user_stats SET tag_count = tag_count - 1 WHERE user_id = uid;
+    ELSIF after_uses = delta THEN
+        UPDATE user_stats SET tag_count = tag_count + 1 WHERE user_id = uid;
+    END IF;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION counters_entries_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.active = 1 THEN
+        PERFORM counters_bump_entries(OLD.user_id, -1);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM counters_bump_tag(OLD.user_id, et.tag_id, -1) FROM entry_tags et WHERE et.entry_id = OLD.id;
+        END IF;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') AND NEW.active = 1 THEN
+        PERFORM counters_bump_entries(NEW.user_id, 1);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM counters_bump_tag(NEW.user_id, et.tag_id, 1) FROM entry_tags et WHERE et.entry_id = NEW.id;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION counters_entry_tags_trigger() RETURNS trigger AS $$
+DECLARE
+    owner INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT user_id INTO owner FROM entries WHERE id = NEW.entry_id AND active = 1;
+        IF owner IS NOT NULL THEN
+            PERFORM counters_bump_tag(owner, NEW.tag_id, 1);
+        END IF;
+    ELSE
+        SELECT user_id INTO owner FROM entries WHERE id = OLD.entry_id AND active = 1;
+        IF owner IS NOT NULL THEN
+            PERFORM counters_bump_tag(owner, OLD.tag_id, -1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS counters_entries ON entries;
+CREATE TRIGGER counters_entries
+    AFTER INSERT OR DELETE OR UPDATE OF active, user_id ON entries
+    FOR EACH ROW EXECUTE FUNCTION counters_entries_trigger();
+
+DROP TRIGGER IF EXISTS counters_entry_tags ON entry_tags;
+CREATE TRIGGER counters_entry_tags
+    AFTER INSERT OR DELETE ON entry_tags
+    FOR EACH ROW EXECUTE FUNCTION counters_entry_tags_trigger();
+
+CREATE OR REPLACE VIEW user_summary AS
+SELECT u.id AS user_id, u.username,
+       coalesce(s.entry_count, 0)::bigint AS entry_count,
+       coalesce(s.tag_count, 0)::bigint AS tag_count
+FROM users u LEFT JOIN user_stats s ON s.user_id = u.id;
+'''
+
+# hitung ulang semua counter dari nol ke tabel sementara, buat dibandingin sama yang ada
+FRESH_SQL = '''
+CREATE TEMP TABLE fresh_tag_uses ON COMMIT DROP AS
+    SELECT e.user_id, et.tag_id, count(*)::int AS uses
+    FROM entries e JOIN entry_tags et ON et.entry_id = e.id
+    WHERE e.active = 1
+    GROUP BY e.user_id, et.tag_id;
+
+CREATE TEMP TABLE fresh_user_stats ON COMMIT DROP AS
+    SELECT u.id AS user_id,
+           (SELECT count(*) FROM entries e WHERE e.user_id = u.id AND e.active = 1)::int AS entry_count,
+           (SELECT count(*) FROM fresh_tag_uses f WHERE f.user_id = u.id)::int AS tag_count
+    FROM users u;
+'''
+
+
+def install(cur):
+    cur.execute(SCHEMA_SQL)
+
+def global_stats(cur):
+    cur.execute("SELECT name, value FROM app_counters WHERE name IN ('total_stories', 'total_writers')")
+    stats = {'total_stories': 0, 'total_writers': 0}
+    stats.update({row['name']: row['value'] for row in cur.fetchall()})
+    return stats
+
+def user_stats(cur, user_id):
+    cur.execute('SELECT entry_count, tag_count FROM user_stats WHERE user_id = %s', (user_id,))
+    return cur.fetchone() or {'entry_count': 0, 'tag_count': 0}
+
+def reconcile(cur, apply=True):
+    # -> dict jumlah baris yang drift. tabel entries dikunci SHARE biar gak ada write di tengah jalan
+    cur.execute('LOCK TABLE entries, entry_tags IN SHARE MODE')
+    cur.execute(FRESH_SQL)
+
+    cur.execute('''
+        SELECT count(*) AS c FROM fresh_user_stats f
+        FULL JOIN user_stats s ON s.user_id = f.user_id
+        WHERE coalesce(f.entry_count, 0) <> coalesce(s.entry_count, 0)
+           OR coalesce(f.tag_count, 0) <> coalesce(s.tag_count, 0)
+    ''')
+    drift = {'user_stats': cur.fetchone()['c']}
+    cur.execute('''
+        SELECT count(*) AS c FROM fresh_tag_uses f
+        FULL JOIN user_tag_uses t ON t.user_id = f.user_id AND t.tag_id = f.tag_id
+        WHERE coalesce(f.uses, 0) <> coalesce(t.uses, 0)
+    ''')
+    drift['user_tag_uses'] = cur.fetchone()['c']
+    cur.execute('''
+        SELECT
+            (SELECT coalesce(sum(entry_count), 0) FROM fresh_user_stats) AS total_stories,
+            (SELECT count(*) FROM fresh_user_stats WHERE entry_count > 0) AS total_writers
+    ''')
+    fresh = cur.fetchone()
+    current = global_stats(cur)
+    for name in ('total_stories', 'total_writers'):
+        drift[name] = int(fresh[name]) - int(current[name])
+
+    if apply:
+        cur.execute('DELETE FROM user_tag_uses')
+        cur.execute('INSERT INTO user_tag_uses SELECT user_id, tag_id, uses FROM fresh_tag_uses')
+        cur.execute('DELETE FROM user_stats')
+        cur.execute('INSERT INTO user_stats SELECT user_id, entry_count, tag_count FROM fresh_user_stats')
+        cur.execute("UPDATE app_counters SET value = %s WHERE name = 'total_stories'", (fresh['total_stories'],))
+        cur.execute("UPDATE app_counters SET value = %s WHERE name = 'total_writers'", (fresh['total_writers'],))
+        # angka di home ke-cache per generation, jadi ikut di-bump biar hasil reconcile keliatan
+        pagecache.bump(cur)
+    return drift
+
+
+@click.command('counters-reconcile')
+@click.option('--dry-run', is_flag=True, help='Cuma laporin drift, gak nulis apa-apa.')
+@with_appcontext
+def reconcile_command(dry_run):
+    """Pasang tabel/trigger counter lalu hitung ulang semuanya dari nol."""
+    from app.db import get_db
+    conn, cur = get_db()
+    install(cur)
+    drift = reconcile(cur, apply=not dry_run)
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    for name, value in drift.items():
+        click.echo(f'{name}: {value:+d}' if name.startswith('total_') else f'{name}: {value} rows drifted')
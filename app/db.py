@@ -1,26 +1,386 @@
 import os
+import time
+import threading
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
-from flask import g
+from flask import g, session, request, has_request_context
+from app import metrics
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class QueryCursor(RealDictCursor):
+    # RealDictCursor yang tiap execute()-nya dicatet ke app/metrics.py (durasi, jumlah baris, slow log)
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.observe_query(self, query, vars, time.perf_counter() - started)
+
+
+class ConnectionPool:
+    # pool koneksi per proses (per worker gunicorn), thread-safe.
+    # koneksi dicek waktu dibalikin: transaksi yang nyangkut di-rollback, yang rusak dibuang.
+    def __init__(self, minconn, maxconn, timeout=10, max_lifetime=1800, ping_after=30, **dsn):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.dsn = dsn
+
+        self._idle = []  # list of (conn, created_at, returned_at)
+        self._born = {}  # id(conn) -> created_at
+        self._pending = 0
+        self._cond = threading.Condition()
+        self.stats = {'checked_out': 0, 'waiting': 0, 'created': 0, 'recycled': 0, 'rolled_back': 0, 'timeouts': 0}
+
+        for _ in range(minconn):
+            conn = psycopg2.connect(**self.dsn)
+            self._register(conn)
+            self._idle.append((conn, self._born[id(conn)], time.monotonic()))
+
+    def _register(self, conn):
+        self._born[id(conn)] = time.monotonic()
+        self.stats['created'] += 1
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        self.stats['recycled'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _alive(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn, needs_ping = self._checkout(deadline)
+            if conn is None:
+                break
+            # koneksi yang lama nganggur di-ping dulu (RDS suka mutusin idle connection).
+            # ping-nya di luar lock: koneksi setengah mati bisa nahan sampai socket timeout,
+            # thread lain jangan ikut ketahan
+            if not needs_ping or self._alive(conn):
+                return conn
+            with self._cond:
+                self.stats['checked_out'] -= 1
+                self._discard(conn)
+                self._cond.notify()
+
+        conn = None
+        try:
+            conn = psycopg2.connect(**self.dsn)
+        finally:
+            with self._cond:
+                self._pending -= 1
+                if conn is not None:
+                    self._register(conn)
+                    self.stats['checked_out'] += 1
+                self._cond.notify()
+        return conn
+
+    def _checkout(self, deadline):
+        # -> (koneksi idle, perlu di-ping?) atau (None, False) kalau slot koneksi baru udah di-reserve
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn, born, returned = self._idle.pop()
+                    now = time.monotonic()
+                    if conn.closed or now - born > self.max_lifetime:
+                        self._discard(conn)
+                        continue
+                    self.stats['checked_out'] += 1
+                    return conn, now - returned > self.ping_after
+
+                if len(self._born) + self._pending < self.maxconn:
+                    # reserve slot dulu biar thread lain gak ikut bikin koneksi
+                    self._pending += 1
+                    return None, False
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(f'no free connection after {self.timeout}s (max={self.maxconn})')
+                self.stats['waiting'] += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.stats['waiting'] -= 1
+
+    def putconn(self, conn):
+        healthy = not conn.closed
+        if healthy:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                healthy = False
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                # request selesai tanpa commit / query error -> rollback sebelum dipake lagi
+                try:
+                    conn.rollback()
+                    self.stats['rolled_back'] += 1
+                except Exception:
+                    healthy = False
+
+        with self._cond:
+            self.stats['checked_out'] -= 1
+            born = self._born.get(id(conn))
+            if not healthy or born is None or time.monotonic() - born > self.max_lifetime:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, born, time.monotonic()))
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            data = dict(self.stats)
+            data['idle'] = len(self._idle)
+            data['open'] = len(self._born)
+            data['min'] = self.minconn
+            data['max'] = self.maxconn
+        return data
+
+    def closeall(self):
+        with self._cond:
+            for conn, _, _ in self._idle:
+                self._born.pop(id(conn), None)
+                conn.close()
+            self._idle = []
+
+
+def primary_dsn():
+    return {
+        'dbname': os.environ.get('DB_NAME'),
+        'user': os.environ.get('DB_USER'),
+        'password': os.environ.get('DB_PASS'),
+        'host': os.environ.get('DB_HOST'),
+        'port': os.environ.get('DB_PORT')
+    }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool, _pool_pid
+    # pool dibikin lazy per proses, jadi aman walau gunicorn fork setelah import
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    int(os.environ.get('DB_POOL_MIN', 1)),
+                    int(os.environ.get('DB_POOL_MAX', 5)),
+                    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                    max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+                    ping_after=float(os.environ.get('DB_POOL_PING_AFTER', 30)),
+                    **primary_dsn()
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.down_until = 0.0
+        self.lag = None
+        self.checked_at = 0.0
+        self.stats = {'reads': 0, 'failures': 0, 'lagging': 0}
+
+
+class ReplicaSet:
+    # replica baca, dipilih bergiliran. yang gagal connect / kebanyakan lag dianggap mati
+    # selama retry_after detik; kalau semuanya mati, baca balik ke primary.
+    LAG_SQL = """
+        SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+    """
+
+    def __init__(self, replicas, retry_after=30, max_lag=10, check_every=5):
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self.max_lag = max_lag
+        self.check_every = check_every
+        self.next = 0
+        self.lock = threading.Lock()
+        self.stats = {'fallbacks': 0}
+
+    def mark_down(self, replica, reason):
+        replica.down_until = time.monotonic() + self.retry_after
+        replica.stats['failures'] += 1
+        print(f"Replica {replica.name} down for {self.retry_after}s: {reason}")
+
+    def _lagging(self, replica, conn):
+        now = time.monotonic()
+        if now - replica.checked_at < self.check_every:
+            return replica.lag is not None and replica.lag > self.max_lag
+        with conn.cursor() as cur:
+            cur.execute(self.LAG_SQL)
+            replica.lag = float(cur.fetchone()[0])
+        conn.rollback()
+        replica.checked_at = now
+        return replica.lag > self.max_lag
+
+    def getconn(self):
+        # -> (replica, conn) atau (None, None) kalau gak ada replica yang sehat
+        with self.lock:
+            start = self.next
+            self.next = (self.next + 1) % len(self.replicas)
+        now = time.monotonic()
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.down_until > now:
+                continue
+            try:
+                conn = replica.pool.getconn()
+            except (psycopg2.Error, PoolTimeout) as e:
+                self.mark_down(replica, e)
+                continue
+            try:
+                lagging = self._lagging(replica, conn)
+            except psycopg2.Error as e:
+                replica.pool.putconn(conn)
+                self.mark_down(replica, e)
+                continue
+            if lagging:
+                replica.pool.putconn(conn)
+                replica.stats['lagging'] += 1
+                replica.down_until = now + self.check_every
+                continue
+            replica.stats['reads'] += 1
+            return replica, conn
+        self.stats['fallbacks'] += 1
+        return None, None
+
+    def snapshot(self):
+        now = time.monotonic()
+        return [dict(r.stats, name=r.name, healthy=r.down_until <= now, lag=r.lag, pool=r.pool.snapshot())
+                for r in self.replicas]
+
+
+_replicas = None
+_replicas_pid = None
+
+def get_replicas():
+    # DB_REPLICA_HOSTS="host1:5432,host2" -> ReplicaSet (user/password/dbname sama kayak primary), atau None
+    global _replicas, _replicas_pid
+    hosts = [h.strip() for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+    if not hosts:
+        return None
+    if _replicas is None or _replicas_pid != os.getpid():
+        with _pool_lock:
+            if _replicas is None or _replicas_pid != os.getpid():
+                replicas = []
+                for spec in hosts:
+                    host, _, port = spec.partition(':')
+                    pool = ConnectionPool(
+                        0,
+                        int(os.environ.get('DB_REPLICA_POOL_MAX', os.environ.get('DB_POOL_MAX', 5))),
+                        timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                        max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+                        ping_after=float(os.environ.get('DB_POOL_PING_AFTER', 30)),
+                        dbname=os.environ.get('DB_NAME'),
+                        user=os.environ.get('DB_USER'),
+                        password=os.environ.get('DB_PASS'),
+                        host=host,
+                        port=port or os.environ.get('DB_PORT'),
+                        connect_timeout=int(os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 3))
+                    )
+                    replicas.append(Replica(spec, pool))
+                _replicas = ReplicaSet(
+                    replicas,
+                    retry_after=float(os.environ.get('DB_REPLICA_RETRY', 30)),
+                    max_lag=float(os.environ.get('DB_REPLICA_MAX_LAG', 10)),
+                    check_every=float(os.environ.get('DB_REPLICA_CHECK_EVERY', 5))
+                )
+                _replicas_pid = os.getpid()
+    return _replicas
+
+def pool_stats():
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.snapshot()
+
+def replica_stats():
+    if _replicas is None or _replicas_pid != os.getpid():
+        return None
+    return {'fallbacks': _replicas.stats['fallbacks'], 'replicas': _replicas.snapshot()}
 
 def get_db():
+    # handle tulis (primary). semua yang nulis, dan apa pun yang harus baca data paling baru
     if 'db' not in g:
-        g.db = psycopg2.connect(
-            dbname=os.environ.get('DB_NAME'),
-            user=os.environ.get('DB_USER'),
-            password=os.environ.get('DB_PASS'),
-            host=os.environ.get('DB_HOST'),
-            port=os.environ.get('DB_PORT')
-        )
+        g.db = get_pool().getconn()
         # RealDictCursor biar hasil query bisa dipanggil pake nama kolom (ex: user['username'])
-        g.cursor = g.db.cursor(cursor_factory=RealDictCursor)
+        g.cursor = g.db.cursor(cursor_factory=QueryCursor)
     return g.db, g.cursor
 
+def _sticky():
+    # read-your-writes: abis nulis, user ini baca dari primary dulu sampe replica-nya nyusul
+    if not has_request_context():
+        return False
+    wrote_at = session.get('db_wrote_at')
+    return wrote_at is not None and time.time() - wrote_at < float(os.environ.get('DB_STICKY_SECONDS', 5))
+
+def get_read_db():
+    # handle baca: replica kalau ada yang sehat, selain itu (atau lagi sticky) sama dengan get_db()
+    if 'db' in g:
+        return g.db, g.cursor
+    if 'read_db' not in g:
+        replicas = get_replicas()
+        replica, conn = (None, None) if replicas is None or _sticky() else replicas.getconn()
+        if conn is None:
+            return get_db()
+        g.read_replica = replica
+        g.read_db = conn
+        g.read_cursor = conn.cursor(cursor_factory=QueryCursor)
+    return g.read_db, g.read_cursor
+
+def read_pool():
+    # -> (pool, replica) buat yang perlu koneksi sendiri di luar g (streaming export)
+    replicas = get_replicas()
+    if replicas is not None and not _sticky():
+        replica, conn = replicas.getconn()
+        if conn is not None:
+            replica.pool.putconn(conn)
+            return replica.pool, replica
+    return get_pool(), None
+
+def mark_write(response):
+    # after_request: request yang ngubah sesuatu (POST dll) dan nyentuh primary bikin sesi ini sticky
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and 'db' in g and 'user_id' in session:
+        session['db_wrote_at'] = time.time()
+    return response
+
 def close_db(e=None):
     db = g.pop('db', None)
     cursor = g.pop('cursor', None)
-    
+
     if cursor is not None:
         cursor.close()
     if db is not None:
-        db.close()
\ No newline at end of file
+        get_pool().putconn(db)
+
+    read_db = g.pop('read_db', None)
+    read_cursor = g.pop('read_cursor', None)
+    replica = g.pop('read_replica', None)
+    if read_cursor is not None:
+        read_cursor.close()
+    if read_db is not None:
+        if read_db.closed:
+            # koneksi putus di tengah request -> replica-nya istirahat dulu
+            get_replicas().mark_down(replica, 'connection lost during request')
+        replica.pool.putconn(read_db)
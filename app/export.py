@@ -0,0 +1,108 @@
+import os
+import json
+import datetime
+import threading
+import click
+from psycopg2.extras import RealDictCursor
+from flask.cli import with_appcontext
+from app.feed import ENTRY_COLUMNS, TRACK_COLUMNS, TRACK_JOIN
+
+# export entry tanpa fetchall(): baca lewat named (server-side) cursor per BATCH baris,
+# tiap batch langsung diubah jadi teks & dilepas. memori worker tetap kecil berapapun
+# jumlah entry-nya, dan baris pertama udah kekirim sebelum query-nya selesai dibaca.
+BATCH = 2000
+FORMATS = {'ndjson': 'application/x-ndjson', 'geojson': 'application/geo+json'}
+
+# export HTTP megang satu koneksi pool selama streaming; pembaca lambat jangan sampai
+# ngabisin pool yang dipake halaman lain. dibatesin per worker, jauh di bawah DB_POOL_MAX.
+slots = threading.BoundedSemaphore(int(os.environ.get('EXPORT_MAX_CONCURRENT', 2)))
+
+EXPORT_SQL = f'''
+    SELECT {ENTRY_COLUMNS}, {TRACK_COLUMNS}, u.username, tl.tags_list
+    FROM entries e
+    JOIN users u ON e.user_id = u.id
+    {TRACK_JOIN}
+    LEFT JOIN LATERAL (
+        SELECT string_agg(t.name, ',') AS tags_list
+        FROM entry_tags et JOIN tags t ON et.tag_id = t.id
+        WHERE et.entry_id = e.id
+    ) tl ON true
+    WHERE {{where}}
+    ORDER BY e.id
+'''
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} gak bisa dijadiin JSON')
+
+def _dumps(value):
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+def rows(conn, user_id=None, batch=BATCH):
+    # user_id=None -> semua entry aktif (peta publik); selain itu semua entry user itu termasuk arsip.
+    # dipake di transaksi sendiri, jadi jangan ada write di koneksi yang sama selama export jalan.
+    if user_id is None:
+        sql, params = EXPORT_SQL.format(where='e.active = 1'), ()
+    else:
+        sql, params = EXPORT_SQL.format(where='e.user_id = %s'), (user_id,)
+
+    cur = conn.cursor(name='entries_export', cursor_factory=RealDictCursor)
+    cur.itersize = batch
+    try:
+        cur.execute(sql, params)
+        while True:
+            chunk = cur.fetchmany(batch)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        cur.close()
+        conn.rollback()
+
+def _feature(row):
+    row = dict(row)
+    lat, lon = row['latitude'], row['longitude']
+    geometry = {'type': 'Point', 'coordinates': [lon, lat]} if lat is not None and lon is not None else None
+    return {'type': 'Feature', 'id': row['id'], 'geometry': geometry, 'properties': row}
+
+def ndjson(batches):
+    for chunk in batches:
+        yield ''.join(_dumps(row) + '\n' for row in chunk)
+
+def geojson(batches):
+    yield '{"type":"FeatureCollection","features":['
+    first = True
+    for chunk in batches:
+        body = ','.join(_dumps(_feature(row)) for row in chunk)
+        yield body if first else ',' + body
+        first = False
+    yield ']}\n'
+
+def render(fmt, batches):
+    return ndjson(batches) if fmt == 'ndjson' else geojson(batches)
+
+
+@click.command('entries-export')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='ndjson')
+@click.option('--user', 'username', default=None, help='Cuma entry user ini (termasuk yang diarsip).')
+@click.option('--output', '-o', default='-', help='File tujuan, default stdout.')
+@click.option('--batch', default=BATCH, help='Baris per round trip ke PostgreSQL.')
+@with_appcontext
+def export_command(fmt, username, output, batch):
+    """Export entry (NDJSON / GeoJSON) secara streaming."""
+    from app.db import get_db
+    conn, cur = get_db()
+    user_id = None
+    if username:
+        cur.execute('SELECT id FROM users WHERE username = %s', (username,))
+        user = cur.fetchone()
+        conn.rollback()
+        if not user:
+            raise click.ClickException(f'user {username} gak ada')
+        user_id = user['id']
+
+    with click.open_file(output, 'w', encoding='utf-8') as out:
+        for part in render(fmt, rows(conn, user_id, batch)):
+            out.write(part)
@@ -0,0 +1,73 @@
+import base64
+import datetime
+
+# keyset pagination pake (created_at, id): halaman berikutnya dimulai tepat setelah
+# baris terakhir halaman sebelumnya, jadi biayanya O(page size) berapapun dalemnya.
+FEED_PAGE_SIZE = 10
+USER_PAGE_SIZE = 20
+
+ENTRY_COLUMNS = '''
+    e.id, e.user_id, e.title, e.description, e.image_url, e.gmaps_link, e.spotify_url,
+    e.pin_color, e.latitude, e.longitude, e.active, e.created_at
+'''
+
+# metadata lagu buat kartu spotify (lihat app/tracks.py), selalu bareng TRACK_JOIN
+TRACK_COLUMNS = '''
+    e.spotify_track_id, st.name AS track_name, st.artist AS track_artist,
+    st.image_url AS track_image, st.duration_ms AS track_duration_ms
+'''
+TRACK_JOIN = 'LEFT JOIN spotify_tracks st ON st.track_id = e.spotify_track_id'
+
+
+def encode_cursor(row):
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    # -> (created_at, id) atau None kalau kosong / ngaco
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, entry_id = raw.rsplit('|', 1)
+        return datetime.datetime.fromisoformat(created_at), int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def _page(rows, limit):
+    rows = rows[:limit + 1]
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def public_page(cur, before=None, limit=FEED_PAGE_SIZE):
+    # -> (rows, next_cursor). entry aktif semua user + username/foto/tag
+    after_ts, after_id = decode_cursor(before) or (None, None)
+    cur.execute(f'''
+        SELECT {ENTRY_COLUMNS}, {TRACK_COLUMNS}, u.username, u.profile_pic, tl.tags_list
+        FROM entries e
+        JOIN users u ON e.user_id = u.id
+        {TRACK_JOIN}
+        LEFT JOIN LATERAL (
+            SELECT string_agg(t.name, ',') AS tags_list
+            FROM entry_tags et JOIN tags t ON et.tag_id = t.id
+            WHERE et.entry_id = e.id
+        ) tl ON true
+        WHERE e.active = 1 AND (%s OR (e.created_at, e.id) < (%s, %s))
+        ORDER BY e.created_at DESC, e.id DESC
+        LIMIT %s
+    ''', (after_id is None, after_ts, after_id, limit + 1))
+    return _page(cur.fetchall(), limit)
+
+def user_page(cur, user_id, before=None, limit=USER_PAGE_SIZE, active_only=False):
+    # -> (rows, next_cursor). entry punya satu user, termasuk yang diarsip
+    after_ts, after_id = decode_cursor(before) or (None, None)
+    cur.execute(f'''
+        SELECT {ENTRY_COLUMNS}, {TRACK_COLUMNS}
+        FROM entries e
+        {TRACK_JOIN}
+        WHERE e.user_id = %s AND (%s OR e.active = 1)
+          AND (%s OR (e.created_at, e.id) < (%s, %s))
+        ORDER BY e.created_at DESC, e.id DESC
+        LIMIT %s
+    ''', (user_id, not active_only, after_id is None, after_ts, after_id, limit + 1))
+    return _page(cur.fetchall(), limit)
@@ -0,0 +1,142 @@
+import os
+import math
+import time
+import heapq
+import threading
+from app import changes
+
+
+class GridIndex:
+    # spatial index grid sederhana: tiap sel ukuran cell_deg x cell_deg derajat.
+    # points: id -> (lat, lon, pin_color)
+    def __init__(self, cell_deg=1.0):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.points = {}
+        self.lock = threading.RLock()
+        # jam dinding waktu index mulai diisi: semua write yang commit sebelum ini udah kebawa
+        self.built_at = time.time()
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lon / self.cell_deg)), int(math.floor(lat / self.cell_deg)))
+
+    def __len__(self):
+        return len(self.points)
+
+    def upsert(self, entry_id, lat, lon, pin_color=None):
+        with self.lock:
+            self.remove(entry_id)
+            self.points[entry_id] = (lat, lon, pin_color)
+            self.cells.setdefault(self._cell(lat, lon), set()).add(entry_id)
+
+    def remove(self, entry_id):
+        with self.lock:
+            old = self.points.pop(entry_id, None)
+            if old is None:
+                return False
+            key = self._cell(old[0], old[1])
+            bucket = self.cells.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.cells[key]
+            return True
+
+    def _scan(self, min_lon, min_lat, max_lon, max_lat):
+        x0, y0 = self._cell(min_lat, min_lon)
+        x1, y1 = self._cell(max_lat, max_lon)
+        # kalau bbox-nya lebar (zoom jauh), lebih murah jalan di sel yang keisi aja
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            keys = [k for k in self.cells if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+        else:
+            keys = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in self.cells]
+
+        for key in keys:
+            # sel di pinggir bbox masih perlu dicek titik per titik
+            inner = x0 < key[0] < x1 and y0 < key[1] < y1
+            for entry_id in self.cells[key]:
+                lat, lon, _ = self.points[entry_id]
+                if inner or (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+                    yield entry_id
+
+    def query(self, bbox, limit=None):
+        # bbox: list of (min_lon, min_lat, max_lon, max_lat), lebih dari satu kalau nyebrang antimeridian
+        with self.lock:
+            ids = set()
+            for box in bbox:
+                ids.update(self._scan(*box))
+        total = len(ids)
+        # id makin gede = makin baru
+        if limit is not None and total > limit:
+            return heapq.nlargest(limit, ids), total
+        return sorted(ids, reverse=True), total
+
+
+def parse_bbox(raw):
+    # "minLon,minLat,maxLon,maxLat" -> list of box yang udah dinormalisasi ke [-180, 180]
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(x) for x in raw.split(',')]
+    except (AttributeError, ValueError):
+        return None
+    if not all(math.isfinite(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+        return None
+    if min_lat > max_lat or min_lon > max_lon:
+        return None
+
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    if max_lon - min_lon >= 360:
+        return [(-180.0, min_lat, 180.0, max_lat)]
+
+    # leaflet bisa ngasih lon di luar +-180 kalau peta digeser terus
+    wrap = lambda v: ((v + 180.0) % 360.0) - 180.0
+    w, e = wrap(min_lon), wrap(max_lon)
+    if w <= e:
+        return [(w, min_lat, e, max_lat)]
+    return [(w, min_lat, 180.0, max_lat), (-180.0, min_lat, e, max_lat)]
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+_index = None
+_loaded_at = 0
+_load_lock = threading.Lock()
+
+def index_ttl():
+    return float(os.environ.get('MAP_INDEX_TTL', 60))
+
+def get_index(cur):
+    # index dibangun lazy per worker. write dari worker lain nyampe lewat listener
+    # app/stream.py; buat jaga-jaga (listener putus, LIVE_UPDATES=0) index tetep
+    # di-rebuild penuh tiap MAP_INDEX_TTL detik.
+    global _index, _loaded_at
+    ttl = index_ttl()
+    if _index is not None and time.monotonic() - _loaded_at < ttl:
+        return _index
+
+    with _load_lock:
+        if _index is not None and time.monotonic() - _loaded_at < ttl:
+            return _index
+        index = GridIndex(float(os.environ.get('MAP_GRID_DEG', 1.0)))
+        cur.execute('''
+            SELECT id, latitude, longitude, pin_color
+            FROM entries
+            WHERE active = 1 AND latitude IS NOT NULL AND longitude IS NOT NULL
+        ''')
+        for row in cur.fetchall():
+            index.upsert(row['id'], row['latitude'], row['longitude'], row['pin_color'])
+        _index, _loaded_at = index, time.monotonic()
+    return _index
+
+@changes.subscribe
+def _on_entry_change(event):
+    global _loaded_at
+    if _index is None:
+        return
+    if event['kind'] == 'reset':
+        _loaded_at = 0  # request berikutnya bangun ulang dari database
+        return
+    if event['active'] and event['lat'] is not None and event['lon'] is not None:
+        _index.upsert(event['id'], float(event['lat']), float(event['lon']), event['pin_color'])
+    else:
+        _index.remove(event['id'])
@@ -0,0 +1,143 @@
+import os
+import threading
+import numpy as np
+from app import changes, cluster
+
+# layer kepadatan buat zoom jauh: pin aktif dihitung per sel grid web mercator.
+# grid paling halus 2^top x 2^top sel, level di atasnya hasil jumlah 2x2 sel di bawahnya,
+# jadi tiap zoom tinggal ambil level yang selnya pas di layar (CELL_SHIFT -> 8 sel per tile).
+# write cuma nambah/ngurangin satu sel per level; daftar sel yang keisi per level
+# di-cache sampai ada write berikutnya.
+CELL_SHIFT = 3
+
+
+def _project(lat, lon):
+    lat = np.clip(lat, -cluster.MAX_LAT, cluster.MAX_LAT)
+    s = np.sin(np.radians(lat))
+    return (lon + 180.0) / 360.0, 0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)
+
+def _unproject(x, y):
+    return np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y)))), x * 360.0 - 180.0
+
+
+class DensityGrid:
+    def __init__(self, top=10):
+        self.top = top
+        self.size = 2 ** top
+        self.levels = [np.zeros((2 ** z, 2 ** z), dtype=np.int32) for z in range(top + 1)]
+        self.cells = {}  # id -> (cx, cy) di level paling halus
+        self.version = 0
+        self.cache = {}  # level -> (version, lat, lon, weight)
+        self.lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        x, y = cluster.project(lat, lon)
+        return min(int(x * self.size), self.size - 1), min(int(y * self.size), self.size - 1)
+
+    def load(self, points):
+        # points: {id: (lat, lon, ...)} -> semua level dihitung ulang sekaligus
+        n = len(points)
+        ids = np.fromiter(points.keys(), dtype=np.int64, count=n)
+        lat = np.fromiter((p[0] for p in points.values()), dtype=np.float64, count=n)
+        lon = np.fromiter((p[1] for p in points.values()), dtype=np.float64, count=n)
+        x, y = _project(lat, lon)
+        cx = np.clip((x * self.size).astype(np.int64), 0, self.size - 1)
+        cy = np.clip((y * self.size).astype(np.int64), 0, self.size - 1)
+
+        finest = np.bincount(cy * self.size + cx, minlength=self.size * self.size)
+        with self.lock:
+            self.levels[self.top] = finest.reshape(self.size, self.size).astype(np.int32)
+            for z in range(self.top - 1, -1, -1):
+                half = 2 ** z
+                self.levels[z] = self.levels[z + 1].reshape(half, 2, half, 2).sum(axis=(1, 3), dtype=np.int32)
+            self.cells = dict(zip(ids.tolist(), zip(cx.tolist(), cy.tolist())))
+            self.version += 1
+
+    def _bump(self, cell, delta):
+        cx, cy = cell
+        for z in range(self.top + 1):
+            shift = self.top - z
+            self.levels[z][cy >> shift, cx >> shift] += delta
+
+    def upsert(self, entry_id, lat, lon):
+        cell = self._cell(lat, lon)
+        with self.lock:
+            old = self.cells.get(entry_id)
+            if old == cell:
+                return
+            if old is not None:
+                self._bump(old, -1)
+            self._bump(cell, 1)
+            self.cells[entry_id] = cell
+            self.version += 1
+
+    def remove(self, entry_id):
+        with self.lock:
+            old = self.cells.pop(entry_id, None)
+            if old is not None:
+                self._bump(old, -1)
+                self.version += 1
+
+    def _nonzero(self, z):
+        with self.lock:
+            cached = self.cache.get(z)
+            if cached is not None and cached[0] == self.version:
+                return cached[1:]
+            grid = self.levels[z].copy()
+            version = self.version
+        ys, xs = np.nonzero(grid)
+        weight = grid[ys, xs]
+        n = 2 ** z
+        lat, lon = _unproject((xs + 0.5) / n, (ys + 0.5) / n)
+        with self.lock:
+            self.cache[z] = (version, lat, lon, weight)
+        return lat, lon, weight
+
+    def query(self, bbox, zoom):
+        # -> dict kolom (lat, lon, weight) buat sel yang keisi di dalam bbox
+        z = max(0, min(int(zoom) + CELL_SHIFT, self.top))
+        lat, lon, weight = self._nonzero(z)
+        mask = np.zeros(len(weight), dtype=bool)
+        for min_lon, min_lat, max_lon, max_lat in bbox:
+            mask |= (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+        return {
+            'level': z,
+            'max': int(weight.max()) if len(weight) else 0,
+            'lat': np.round(lat[mask], 4).tolist(),
+            'lon': np.round(lon[mask], 4).tolist(),
+            'weight': weight[mask].tolist()
+        }
+
+
+_grid = None
+_source = None
+_build_lock = threading.Lock()
+
+def max_zoom():
+    # di atas zoom ini peta balik nampilin pin
+    return int(os.environ.get('HEATMAP_MAX_ZOOM', 7))
+
+def point_count():
+    return len(_grid.cells) if _grid is not None else None
+
+def get_grid(index):
+    # grid dibangun dari titik-titik geo.GridIndex, di-rebuild tiap kali index-nya di-reload
+    global _grid, _source
+    if _source is index:
+        return _grid
+    with _build_lock:
+        if _source is not index:
+            grid = DensityGrid(max_zoom() + CELL_SHIFT)
+            with index.lock:
+                grid.load(dict(index.points))
+            _grid, _source = grid, index
+    return _grid
+
+@changes.subscribe
+def _on_entry_change(event):
+    if _grid is None or event['kind'] == 'reset':
+        return  # reset: index geo dibangun ulang, grid ikut
+    if event['active'] and event['lat'] is not None and event['lon'] is not None:
+        _grid.upsert(event['id'], float(event['lat']), float(event['lon']))
+    else:
+        _grid.remove(event['id'])
@@ -0,0 +1,338 @@
+import io
+import re
+import csv
+import json
+import math
+import datetime
+import click
+from flask.cli import with_appcontext
+from app import changes, search, pagecache, tagging, spotify
+
+# import banyak pin sekaligus (CSV, GeoJSON FeatureCollection, atau NDJSON hasil entries-export).
+# file dibaca streaming baris per baris, baris yang gak valid dilewatin & dilaporin, sisanya
+# masuk per BATCH lewat satu INSERT ... unnest() plus satu resolve tag per batch, semuanya
+# dalam satu transaksi: kalau DB-nya gagal di tengah, gak ada yang setengah masuk.
+BATCH = 1000
+MAX_ERRORS = 100
+FORMATS = ('csv', 'geojson', 'ndjson')
+DEFAULT_COLOR = '#ff4757'
+COLOR_RE = re.compile(r'^#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6})$')
+_SKIP = re.compile(r'[\s,]*')
+
+# nama kolom yang diterima, biar export dari tool peta lain bisa langsung masuk
+ALIASES = {
+    'title': ('title', 'name', 'judul'),
+    'description': ('description', 'desc', 'notes', 'deskripsi'),
+    'image_url': ('image_url', 'image', 'photo'),
+    'gmaps_link': ('gmaps_link', 'gmaps', 'google_maps'),
+    'spotify_url': ('spotify_url', 'spotify', 'spotify_link'),
+    'pin_color': ('pin_color', 'color', 'marker-color'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lon', 'lng'),
+    'tags': ('tags', 'tags_list'),
+    'created_at': ('created_at', 'date'),
+}
+
+INSERT_SQL = '''
+    INSERT INTO entries (id, user_id, title, description, image_url, gmaps_link, spotify_url,
+                         spotify_track_id, pin_color, latitude, longitude, active, created_at)
+    SELECT r.id, %s, r.title, r.description, r.image_url, r.gmaps_link, r.spotify_url,
+           r.track_id, r.pin_color, r.latitude, r.longitude, 1, coalesce(r.created_at, now())
+    FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[],
+                %s::text[], %s::text[], %s::float8[], %s::float8[], %s::timestamp[])
+         AS r(id, title, description, image_url, gmaps_link, spotify_url,
+              track_id, pin_color, latitude, longitude, created_at)
+    RETURNING id, user_id, latitude, longitude, pin_color, active
+'''
+
+
+class BadFile(Exception):
+    pass
+
+
+def detect(filename, fmt=None):
+    if fmt:
+        return fmt
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith(('.geojson', '.json')):
+        return 'geojson'
+    raise BadFile('format file gak dikenal (csv / geojson / ndjson)')
+
+def text_stream(binary):
+    # utf-8-sig: CSV dari excel suka ada BOM di depan
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def _flatten(obj):
+    # Feature GeoJSON -> dict datar (properties + koordinat dari geometry)
+    if not isinstance(obj, dict):
+        raise ValueError('bukan object JSON')
+    if obj.get('type') != 'Feature':
+        return obj
+    rec = dict(obj.get('properties') or {})
+    geometry = obj.get('geometry') or {}
+    if geometry.get('type') == 'Point':
+        coords = geometry.get('coordinates') or []
+        if len(coords) >= 2:
+            rec['longitude'], rec['latitude'] = coords[0], coords[1]
+    elif geometry:
+        raise ValueError(f"geometry {geometry.get('type')} gak didukung, cuma Point")
+    return rec
+
+def csv_records(stream):
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise BadFile('CSV kosong')
+    reader.fieldnames = [(f or '').strip().lower() for f in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row
+
+def ndjson_records(stream):
+    for n, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield n, _flatten(json.loads(line))
+        except ValueError as e:
+            yield n, ValueError(f'JSON rusak: {e}')
+
+def geojson_records(stream, chunk=1 << 16):
+    # parser inkremental buat FeatureCollection: feature diurai satu-satu dari buffer,
+    # jadi file gede gak perlu di-json.load() utuh ke memori
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = stream.read(chunk)
+        eof = not data
+        buf, pos = buf[pos:] + data, 0
+
+    while True:
+        start = buf.find('"features"', pos)
+        if start >= 0 and buf.find('[', start) >= 0:
+            pos = buf.find('[', start) + 1
+            break
+        if eof:
+            raise BadFile('GeoJSON harus FeatureCollection dengan "features"')
+        fill()
+
+    n = 0
+    while True:
+        pos = _SKIP.match(buf, pos).end()
+        if pos >= len(buf):
+            if eof:
+                raise BadFile('GeoJSON kepotong di tengah')
+            fill()
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise BadFile(f'feature ke-{n + 1}: JSON rusak ({e.msg})')
+            fill()
+            continue
+        pos = end
+        n += 1
+        try:
+            yield n, _flatten(obj)
+        except ValueError as e:
+            yield n, e
+
+def records(stream, fmt):
+    if fmt == 'csv':
+        return csv_records(stream)
+    if fmt == 'ndjson':
+        return ndjson_records(stream)
+    return geojson_records(stream)
+
+
+def _pick(rec, field):
+    for key in ALIASES[field]:
+        value = rec.get(key)
+        if value is not None and value != '':
+            return value
+    return None
+
+def _text(rec, field, max_len=None):
+    value = _pick(rec, field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    if max_len and len(value) > max_len:
+        raise ValueError(f'{field} kepanjangan (maks {max_len})')
+    return value or None
+
+def _coord(rec, field, limit):
+    value = _pick(rec, field)
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} bukan angka')
+    if not math.isfinite(value) or abs(value) > limit:
+        raise ValueError(f'{field} di luar jangkauan')
+    return value
+
+def normalize(rec):
+    # -> dict siap insert, atau ValueError dengan pesan buat user
+    title = _text(rec, 'title', 255)
+    if not title:
+        raise ValueError('title kosong')
+
+    lat, lon = _coord(rec, 'latitude', 90), _coord(rec, 'longitude', 180)
+    if (lat is None) != (lon is None):
+        raise ValueError('latitude & longitude harus diisi dua-duanya')
+
+    color = _text(rec, 'pin_color') or DEFAULT_COLOR
+    if not COLOR_RE.match(color):
+        raise ValueError(f'pin_color {color!r} bukan warna hex')
+
+    spot_url = _text(rec, 'spotify_url')
+    if spot_url:
+        spot_url = spot_url.split('?')[0]
+
+    tags = _pick(rec, 'tags')
+    if isinstance(tags, list):
+        tags = ','.join(str(t) for t in tags)
+
+    created_at = _text(rec, 'created_at')
+    if created_at:
+        try:
+            created_at = datetime.datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f'created_at {created_at!r} bukan tanggal ISO')
+        if created_at.tzinfo:
+            created_at = created_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    return {
+        'title': title,
+        'description': _text(rec, 'description') or '',
+        'image_url': _text(rec, 'image_url') or '',
+        'gmaps_link': _text(rec, 'gmaps_link') or '',
+        'spotify_url': spot_url,
+        'track_id': spotify.track_id(spot_url),
+        'pin_color': color,
+        'latitude': lat,
+        'longitude': lon,
+        'created_at': created_at,
+        'tags': tagging.parse(str(tags or '')),
+    }
+
+
+def _insert_batch(cur, user_id, rows):
+    # id diambil duluan dari sequence biar tag tiap baris bisa langsung di-link tanpa nebak urutan RETURNING
+    cur.execute("SELECT nextval(pg_get_serial_sequence('entries', 'id')) AS id FROM generate_series(1, %s)",
+                (len(rows),))
+    ids = [r['id'] for r in cur.fetchall()]
+    cols = ('title', 'description', 'image_url', 'gmaps_link', 'spotify_url',
+            'track_id', 'pin_color', 'latitude', 'longitude', 'created_at')
+    cur.execute(INSERT_SQL, [user_id, ids] + [[row[c] for row in rows] for c in cols])
+    inserted = cur.fetchall()
+
+    names = list(dict.fromkeys(name for row in rows for name in row['tags']))
+    if names:
+        tag_ids = tagging.resolve(cur, names)
+        pairs = [(entry_id, tag_ids[name]) for entry_id, row in zip(ids, rows) for name in row['tags']]
+        cur.execute('''
+            INSERT INTO entry_tags (entry_id, tag_id) SELECT * FROM unnest(%s::int[], %s::int[])
+            ON CONFLICT DO NOTHING
+        ''', ([p[0] for p in pairs], [p[1] for p in pairs]))
+
+    search.refresh(cur, entry_ids=ids)
+    return inserted
+
+def load(conn, cur, user_id, recs, batch=BATCH, max_rows=None, dry_run=False):
+    # -> {'imported', 'skipped', 'errors': [(baris, pesan)]}. commit cuma kalau gak dry run
+    result = {'imported': 0, 'skipped': 0, 'errors': []}
+    pending = []
+    # baris yang masuk cuma disimpen selama masih kecil; lewat COALESCE_OVER cukup satu event reset
+    inserted = []
+
+    def flush():
+        nonlocal inserted
+        if pending and not dry_run:
+            rows = _insert_batch(cur, user_id, pending)
+            if inserted is not None:
+                inserted.extend(rows)
+                if len(inserted) > changes.COALESCE_OVER:
+                    inserted = None
+        result['imported'] += len(pending)
+        pending.clear()
+
+    try:
+        for n, rec in recs:
+            if max_rows and result['imported'] + len(pending) + result['skipped'] >= max_rows:
+                raise BadFile(f'kebanyakan baris, maksimal {max_rows} per import')
+            try:
+                if isinstance(rec, Exception):
+                    raise rec
+                pending.append(normalize(rec))
+            except ValueError as e:
+                result['skipped'] += 1
+                if len(result['errors']) < MAX_ERRORS:
+                    result['errors'].append((n, str(e)))
+                continue
+            if len(pending) >= batch:
+                flush()
+        flush()
+    except UnicodeDecodeError:
+        conn.rollback()
+        raise BadFile('file harus UTF-8')
+    except csv.Error as e:
+        conn.rollback()
+        raise BadFile(f'CSV rusak: {e}')
+    except Exception:
+        conn.rollback()
+        raise
+
+    if dry_run or not result['imported']:
+        conn.rollback()
+        return result
+    if inserted is None:
+        changes.notify_reset(cur)
+    else:
+        changes.notify(cur, 'added', inserted)
+    pagecache.bump(cur)
+    conn.commit()
+    if inserted is None:
+        changes.publish_reset()
+    else:
+        changes.publish_rows('added', inserted)
+    return result
+
+
+@click.command('entries-import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--user', 'username', required=True, help='Pemilik entry yang di-import.')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None, help='Default: dari ekstensi file.')
+@click.option('--batch', default=BATCH, help='Baris per INSERT.')
+@click.option('--dry-run', is_flag=True, help='Cuma validasi, gak ada yang disimpen.')
+@with_appcontext
+def import_command(path, username, fmt, batch, dry_run):
+    """Import entry dari CSV / GeoJSON / NDJSON."""
+    from app.db import get_db
+    conn, cur = get_db()
+    cur.execute('SELECT id FROM users WHERE username = %s', (username,))
+    user = cur.fetchone()
+    if not user:
+        raise click.ClickException(f'user {username} gak ada')
+
+    try:
+        fmt = detect(path, fmt)
+        with click.open_file(path, 'rb') as raw:
+            result = load(conn, cur, user['id'], records(text_stream(raw), fmt), batch, dry_run=dry_run)
+    except BadFile as e:
+        raise click.ClickException(str(e))
+
+    for n, msg in result['errors']:
+        click.echo(f'baris {n}: {msg}', err=True)
+    verb = 'valid' if dry_run else 'di-import'
+    click.echo(f"{result['imported']} entry {verb}, {result['skipped']} dilewati")
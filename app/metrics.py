@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import bisect
+import threading
+from flask import g, has_app_context
+from psycopg2 import extensions
+
+# metrik format prometheus (text exposition 0.0.4), disimpen per proses worker.
+# tiap worker gunicorn punya angka sendiri; /metrics jawab punya worker yang kebetulan
+# nerima request-nya, jadi di prometheus di-sum/rate aja per instance.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [counts per bucket..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.series.get(label_values)
+            if row is None:
+                row = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {k: list(v) for k, v in self.series.items()}
+        for values, row in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels, values, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labels, values, ("le", "+Inf"))} {row[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, values)} {row[-2]}')
+            lines.append(f'{self.name}_count{_labels(self.labels, values)} {row[-1]}')
+        return lines
+
+
+_registry = []
+_gauges = []  # callable -> iterable of (name, help, {labels}, value)
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    h = Histogram(name, help, labels, buckets)
+    _registry.append(h)
+    return h
+
+def gauges(fn):
+    # daftarin fungsi yang ngebalikin angka-angka stats modul lain (pool, cache, dll)
+    _gauges.append(fn)
+    return fn
+
+def render():
+    lines = []
+    for h in _registry:
+        lines.extend(h.render())
+    seen = set()
+    for fn in _gauges:
+        try:
+            samples = list(fn())
+        except Exception as e:
+            print(f"metrics collector error: {e}")
+            continue
+        for name, help, labels, value in samples:
+            if value is None:
+                continue
+            if name not in seen:
+                lines += [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+                seen.add(name)
+            lines.append(f'{name}{_labels(labels.keys(), labels.values())} {float(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+request_seconds = histogram('mouthings_http_request_duration_seconds', 'Durasi request per endpoint.',
+                            ('endpoint', 'method', 'status'))
+request_db_seconds = histogram('mouthings_http_request_db_seconds', 'Total waktu SQL dalam satu request.',
+                               ('endpoint',))
+template_seconds = histogram('mouthings_template_render_duration_seconds', 'Durasi render template Jinja.',
+                             ('template',))
+query_seconds = histogram('mouthings_db_query_duration_seconds', 'Durasi statement SQL per template query.',
+                          ('statement',))
+query_rows = histogram('mouthings_db_query_rows', 'Jumlah baris yang dibalikin/kena per statement.',
+                       ('statement',), ROW_BUCKETS)
+spotify_seconds = histogram('mouthings_spotify_request_duration_seconds', 'Durasi request ke Spotify.',
+                            ('endpoint', 'status'))
+
+
+_WS = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def statement_label(query):
+    # label = template query: spasi dirapiin, literal diganti ?, dipotong biar label gak kepanjangan
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    text = _LITERALS.sub('?', _WS.sub(' ', str(query)).strip())
+    return text[:160]
+
+
+class SlowQueryLog:
+    # query yang lebih lama dari SLOW_QUERY_MS dicetak bareng EXPLAIN-nya.
+    # template yang sama cuma di-EXPLAIN sekali per `every` detik biar gak nambah beban.
+    def __init__(self, threshold_ms=0, every=60):
+        self.threshold = threshold_ms / 1000
+        self.every = every
+        self.last = {}
+        self.lock = threading.Lock()
+
+    def maybe_log(self, cursor, query, vars, label, elapsed):
+        if not self.threshold or elapsed < self.threshold:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last.get(label, -self.every) < self.every:
+                return
+            self.last[label] = now
+
+        plan = ''
+        failed = cursor.connection.info.transaction_status == extensions.TRANSACTION_STATUS_INERROR
+        if not failed and label.split(' ', 1)[0].upper() in ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT'):
+            try:
+                # cursor terpisah biar hasil query aslinya gak ketimpa. EXPLAIN tanpa ANALYZE gak ngejalanin query
+                with cursor.connection.cursor() as explain:
+                    explain.execute('EXPLAIN ' + cursor.mogrify(query, vars).decode(errors='replace'))
+                    plan = '\n'.join(row[0] for row in explain.fetchall())
+            except Exception as e:
+                plan = f'(EXPLAIN gagal: {e})'
+        print(f"[slow query] {elapsed * 1000:.1f}ms {label}\n{plan}")
+
+
+slow_queries = SlowQueryLog(float(os.environ.get('SLOW_QUERY_MS', 0)))
+
+def observe_query(cursor, query, vars, elapsed):
+    label = statement_label(query)
+    query_seconds.observe(elapsed, label)
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        query_rows.observe(cursor.rowcount, label)
+    if has_app_context():
+        g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+    slow_queries.maybe_log(cursor, query, vars, label, elapsed)
+
+
+def init_app(app):
+    from flask import request, template_rendered, before_render_template
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def _remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe_request(exc=None):
+        started = g.get('request_started')
+        if started is None:
+            return
+        endpoint = request.endpoint or 'unknown'
+        status = g.get('response_status', 500)
+        request_seconds.observe(time.perf_counter() - started, endpoint, request.method, str(status))
+        request_db_seconds.observe(g.get('db_seconds', 0.0), endpoint)
+
+    def _template_started(sender, template, context, **extra):
+        g.setdefault('template_started', []).append(time.perf_counter())
+
+    def _template_done(sender, template, context, **extra):
+        stack = g.get('template_started')
+        if stack:
+            template_seconds.observe(time.perf_counter() - stack.pop(), template.name or 'string')
+
+    # weak=False: handler-nya fungsi lokal, kalau weakref langsung ke-GC
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_done, app, weak=False)
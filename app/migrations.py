@@ -0,0 +1,419 @@
+import json
+import click
+from flask.cli import with_appcontext
+from psycopg2.extras import RealDictCursor
+from app import counters, feed, search, pagecache, pins, nearby
+
+# skema DB versioned. tiap langkah idempotent (IF NOT EXISTS / CREATE OR REPLACE), jadi aman
+# dijalanin ulang di DB lama yang dulu dibikin manual lewat heredoc template.yaml.
+# versi yang udah jalan dicatet di schema_migrations; langkah baru selalu ditambah di BAWAH,
+# langkah lama jangan diubah. makanya SQL tiap langkah disalin apa adanya di file ini
+# (bukan import dari app/counters.py dll): ngubah modul app gak boleh ikut ngubah
+# apa yang dijalanin migration lama di DB baru.
+
+BASE_SQL = '''
+CREATE TABLE IF NOT EXISTS users (id SERIAL PRIMARY KEY, username VARCHAR(255) UNIQUE NOT NULL, password TEXT NOT NULL, profile_pic TEXT);
+CREATE TABLE IF NOT EXISTS tags (id SERIAL PRIMARY KEY, name VARCHAR(255) UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS entries (
+    id SERIAL PRIMARY KEY, user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    title VARCHAR(255) NOT NULL, description TEXT, image_url TEXT, gmaps_link TEXT, spotify_url TEXT,
+    pin_color VARCHAR(50) DEFAULT '#ff4757', latitude FLOAT, longitude FLOAT, active INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS entry_tags (entry_id INTEGER REFERENCES entries(id), tag_id INTEGER REFERENCES tags(id), PRIMARY KEY(entry_id, tag_id));
+'''
+
+SEARCH_SQL = '''
+ALTER TABLE entries ADD COLUMN IF NOT EXISTS search_doc tsvector;
+CREATE INDEX IF NOT EXISTS entries_search_doc_idx ON entries USING GIN (search_doc);
+'''
+
+# snapshot search.REFRESH_SQL waktu migration 2 ditulis
+SEARCH_REFRESH_SQL = '''
+    UPDATE entries e SET search_doc =
+        setweight(to_tsvector('simple', coalesce(e.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(u.username, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(t.name, ' ')
+            FROM entry_tags et JOIN tags t ON t.id = et.tag_id
+            WHERE et.entry_id = e.id
+        ), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(e.description, '')), 'C')
+    FROM users u
+    WHERE u.id = e.user_id
+'''
+
+FEED_SQL = '''
+CREATE INDEX IF NOT EXISTS entries_feed_idx ON entries (created_at DESC, id DESC) WHERE active = 1;
+CREATE INDEX IF NOT EXISTS entries_user_feed_idx ON entries (user_id, created_at DESC, id DESC);
+'''
+
+# snapshot counters.SCHEMA_SQL waktu migration 4 ditulis
+COUNTERS_SQL = '''
+CREATE TABLE IF NOT EXISTS app_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+ALTER TABLE app_counters ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+INSERT INTO app_counters (name) VALUES ('total_stories'), ('total_writers'), ('entries_generation') ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    tag_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_tag_uses (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    tag_id INTEGER REFERENCES tags(id) ON DELETE CASCADE,
+    uses INTEGER NOT NULL,
+    PRIMARY KEY (user_id, tag_id)
+);
+
+CREATE OR REPLACE FUNCTION counters_bump_entries(uid INTEGER, delta INTEGER) RETURNS void AS $$
+DECLARE
+    before_count INTEGER;
+BEGIN
+    INSERT INTO user_stats (user_id) VALUES (uid) ON CONFLICT (user_id) DO NOTHING;
+    UPDATE user_stats SET entry_count = entry_count + delta
+     WHERE user_id = uid RETURNING entry_count - delta INTO before_count;
+    UPDATE app_counters SET value = value + delta WHERE name = 'total_stories';
+    IF before_count = 0 AND delta > 0 THEN
+        UPDATE app_counters SET value = value + 1 WHERE name = 'total_writers';
+    ELSIF before_count > 0 AND before_count + delta <= 0 THEN
+        UPDATE app_counters SET value = value - 1 WHERE name = 'total_writers';
+    END IF;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION counters_bump_tag(uid INTEGER, tid INTEGER, delta INTEGER) RETURNS void AS $$
+DECLARE
+    after_uses INTEGER;
+BEGIN
+    INSERT INTO user_tag_uses (user_id, tag_id, uses) VALUES (uid, tid, 0) ON CONFLICT DO NOTHING;
+    UPDATE user_tag_uses SET uses = uses + delta
+     WHERE user_id = uid AND tag_id = tid RETURNING uses INTO after_uses;
+    INSERT INTO user_stats (user_id) VALUES (uid) ON CONFLICT (user_id) DO NOTHING;
+    IF after_uses <= 0 THEN
+        DELETE FROM user_tag_uses WHERE user_id = uid AND tag_id = tid;
+        UPDATE user_stats SET tag_count = tag_count - 1 WHERE user_id = uid;
+    ELSIF after_uses = delta THEN
+        UPDATE user_stats SET tag_count = tag_count + 1 WHERE user_id = uid;
+    END IF;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION counters_entries_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.active = 1 THEN
+        PERFORM counters_bump_entries(OLD.user_id, -1);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM counters_bump_tag(OLD.user_id, et.tag_id, -1) FROM entry_tags et WHERE et.entry_id = OLD.id;
+        END IF;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') AND NEW.active = 1 THEN
+        PERFORM counters_bump_entries(NEW.user_id, 1);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM counters_bump_tag(NEW.user_id, et.tag_id, 1) FROM entry_tags et WHERE et.entry_id = NEW.id;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION counters_entry_tags_trigger() RETURNS trigger AS $$
+DECLARE
+    owner INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT user_id INTO owner FROM entries WHERE id = NEW.entry_id AND active = 1;
+        IF owner IS NOT NULL THEN
+            PERFORM counters_bump_tag(owner, NEW.tag_id, 1);
+        END IF;
+    ELSE
+        SELECT user_id INTO owner FROM entries WHERE id = OLD.entry_id AND active = 1;
+        IF owner IS NOT NULL THEN
+            PERFORM counters_bump_tag(owner, OLD.tag_id, -1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS counters_entries ON entries;
+CREATE TRIGGER counters_entries
+    AFTER INSERT OR DELETE OR UPDATE OF active, user_id ON entries
+    FOR EACH ROW EXECUTE FUNCTION counters_entries_trigger();
+
+DROP TRIGGER IF EXISTS counters_entry_tags ON entry_tags;
+CREATE TRIGGER counters_entry_tags
+    AFTER INSERT OR DELETE ON entry_tags
+    FOR EACH ROW EXECUTE FUNCTION counters_entry_tags_trigger();
+
+CREATE OR REPLACE VIEW user_summary AS
+SELECT u.id AS user_id, u.username,
+       coalesce(s.entry_count, 0)::bigint AS entry_count,
+       coalesce(s.tag_count, 0)::bigint AS tag_count
+FROM users u LEFT JOIN user_stats s ON s.user_id = u.id;
+'''
+
+# isi awal counter dari data yang udah ada (sama kayak counters-reconcile)
+COUNTERS_SEED_SQL = '''
+LOCK TABLE entries, entry_tags IN SHARE MODE;
+DELETE FROM user_tag_uses;
+INSERT INTO user_tag_uses (user_id, tag_id, uses)
+    SELECT e.user_id, et.tag_id, count(*)::int
+    FROM entries e JOIN entry_tags et ON et.entry_id = e.id
+    WHERE e.active = 1
+    GROUP BY e.user_id, et.tag_id;
+DELETE FROM user_stats;
+INSERT INTO user_stats (user_id, entry_count, tag_count)
+    SELECT u.id,
+           (SELECT count(*) FROM entries e WHERE e.user_id = u.id AND e.active = 1)::int,
+           (SELECT count(*) FROM user_tag_uses t WHERE t.user_id = u.id)::int
+    FROM users u;
+UPDATE app_counters SET value = (SELECT count(*) FROM entries WHERE active = 1) WHERE name = 'total_stories';
+UPDATE app_counters SET value = (SELECT count(DISTINCT user_id) FROM entries WHERE active = 1) WHERE name = 'total_writers';
+UPDATE app_counters SET value = value + 1, updated_at = now() WHERE name = 'entries_generation';
+'''
+
+# snapshot tracks.SCHEMA_SQL waktu migration 5 ditulis
+TRACKS_SQL = '''
+CREATE TABLE IF NOT EXISTS spotify_tracks (
+    track_id VARCHAR(64) PRIMARY KEY,
+    name TEXT,
+    artist TEXT,
+    album TEXT,
+    image_url TEXT,
+    duration_ms INTEGER,
+    missing BOOLEAN NOT NULL DEFAULT false,
+    fetched_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE entries ADD COLUMN IF NOT EXISTS spotify_track_id VARCHAR(64);
+CREATE INDEX IF NOT EXISTS entries_spotify_track_idx ON entries (spotify_track_id) WHERE spotify_track_id IS NOT NULL;
+'''
+
+# entries(user_id) & entries(active, created_at) udah ketutup entries_user_feed_idx / entries_feed_idx.
+# entry_tags cuma punya PK (entry_id, tag_id), jadi join/hapus lewat tag_id butuh index sendiri.
+# entries_geo_idx: scan bbox & load index peta (cuma pin aktif yang ada koordinatnya).
+PERF_SQL = '''
+CREATE INDEX IF NOT EXISTS entry_tags_tag_idx ON entry_tags (tag_id);
+CREATE INDEX IF NOT EXISTS entries_geo_idx ON entries (latitude, longitude) INCLUDE (pin_color)
+    WHERE active = 1 AND latitude IS NOT NULL AND longitude IS NOT NULL;
+'''
+
+# kNN /api/entries/nearby: kandidat dicari lewat bbox point(lon, lat) di index GiST (lihat app/nearby.py)
+NEARBY_SQL = '''
+CREATE INDEX IF NOT EXISTS entries_nearby_idx ON entries USING GIST (point(longitude, latitude)) WHERE active = 1;
+'''
+
+# versi per entry: dinaikin tiap isi popup-nya bisa berubah (edit, arsip, profil pemiliknya,
+# metadata lagu). cache detail & ETag /api/entries/<id> dikunci ke sini, bukan ke generation global
+ENTRY_VERSION_SQL = '''
+ALTER TABLE entries ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+'''
+
+def _fill_search_doc(cur, missing_only, batch=5000):
+    # per rentang id biar satu UPDATE gak nyentuh semua baris sekaligus
+    cur.execute('SELECT coalesce(min(id), 0) AS lo, coalesce(max(id), 0) AS hi FROM entries')
+    bounds = cur.fetchone()
+    where = ' AND e.id >= %s AND e.id < %s' + (' AND e.search_doc IS NULL' if missing_only else '')
+    for start in range(bounds['lo'], bounds['hi'] + 1, batch):
+        cur.execute(SEARCH_REFRESH_SQL + where, (start, start + batch))
+
+def _search_doc(cur):
+    # kolom baru masih NULL semua, tanpa diisi entry lama gak bakal ketemu di pencarian
+    cur.execute(SEARCH_SQL)
+    _fill_search_doc(cur, missing_only=False)
+
+def _search_doc_missing(cur):
+    # DB yang udah jalanin versi 2 sebelum versi itu ngisi kolomnya
+    _fill_search_doc(cur, missing_only=True)
+
+def _counters(cur):
+    cur.execute(COUNTERS_SQL)
+    cur.execute(COUNTERS_SEED_SQL)
+
+
+MIGRATIONS = [
+    (1, 'base tables', BASE_SQL),
+    (2, 'search_doc + GIN index', _search_doc),
+    (3, 'keyset feed indexes', FEED_SQL),
+    (4, 'trigger-maintained counters', _counters),
+    (5, 'spotify track metadata', TRACKS_SQL),
+    (6, 'entry_tags(tag_id) + geo indexes', PERF_SQL),
+    (7, 'GiST index for nearby entries', NEARBY_SQL),
+    (8, 'backfill empty search_doc', _search_doc_missing),
+    (9, 'per-entry version for popup cache', ENTRY_VERSION_SQL),
+]
+
+# index yang harus ada: (tabel, nama index)
+EXPECTED_INDEXES = [
+    ('entries', 'entries_search_doc_idx'),
+    ('entries', 'entries_feed_idx'),
+    ('entries', 'entries_user_feed_idx'),
+    ('entries', 'entries_spotify_track_idx'),
+    ('entries', 'entries_geo_idx'),
+    ('entries', 'entries_nearby_idx'),
+    ('entry_tags', 'entry_tags_tag_idx'),
+]
+
+
+def _ensure_table(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+
+def applied(cur):
+    # cuma baca: tabelnya belum ada = belum ada yang jalan (db-check gak boleh nulis DDL)
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS present")
+    if not cur.fetchone()['present']:
+        return set()
+    cur.execute('SELECT version FROM schema_migrations')
+    return {row['version'] for row in cur.fetchall()}
+
+def pending(cur):
+    done = applied(cur)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+def migrate(conn, cur, log=print):
+    # -> daftar versi yang baru dijalanin. tiap langkah satu transaksi; advisory lock biar
+    # dua worker/deploy yang jalan barengan gak migrate dobel
+    ran = []
+    for version, name, step in MIGRATIONS:
+        cur.execute('SELECT pg_advisory_xact_lock(8675309)')
+        _ensure_table(cur)
+        if version in applied(cur):
+            conn.commit()
+            continue
+        if callable(step):
+            step(cur)
+        else:
+            cur.execute(step)
+        cur.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (version, name))
+        conn.commit()
+        log(f'{version:>3}  {name}')
+        ran.append(version)
+    return ran
+
+
+def _known_queries(cur):
+    # query yang beneran dipake route, dijalanin sekali biar SQL + parameternya kerekam
+    cur.execute('SELECT id FROM users ORDER BY id LIMIT 1')
+    user = cur.fetchone()
+    uid = user['id'] if user else 0
+    cur.execute('SELECT id FROM entries WHERE active = 1 ORDER BY id DESC LIMIT 20')
+    ids = [row['id'] for row in cur.fetchall()]
+
+    from app.routes.api import fetch_entries
+    return [
+        ('home stats', lambda: counters.global_stats(cur), False),
+        ('entries generation', lambda: pagecache.generation(cur), False),
+        ('public feed', lambda: feed.public_page(cur), False),
+        ('user feed', lambda: feed.user_page(cur, uid), False),
+        ('sidebar', lambda: feed.user_page(cur, uid, limit=5, active_only=True), False),
+        ('search', lambda: search.search(cur, 'kopi senja'), False),
+        ('profile stats', lambda: counters.user_stats(cur, uid), False),
+        ('map pins', lambda: pins.fetch(cur, ids), False),
+        ('entry detail', lambda: fetch_entries(cur, ids[:1]), False),
+        ('entry version', lambda: pins.version(cur, ids[0] if ids else 0), False),
+        ('nearby', lambda: nearby.find(cur, -6.2, 106.8), False),
+        ('entry tags', lambda: cur.execute(
+            'SELECT t.name FROM tags t JOIN entry_tags et ON t.id = et.tag_id WHERE et.entry_id = %s',
+            (ids[0] if ids else 0,)), False),
+        ('entries by tag', lambda: cur.execute(
+            'SELECT entry_id FROM entry_tags WHERE tag_id = (SELECT min(id) FROM tags)'), False),
+        # load index peta emang baca semua pin aktif, seq scan di sini wajar
+        ('map index load', lambda: cur.execute('''
+            SELECT id, latitude, longitude, pin_color FROM entries
+            WHERE active = 1 AND latitude IS NOT NULL AND longitude IS NOT NULL
+        '''), True),
+    ]
+
+
+class _RecordingCursor(RealDictCursor):
+    def execute(self, query, vars=None):
+        self.recorded.append(self.mogrify(query, vars).decode())
+        return super().execute(query, vars)
+
+
+def _seq_scans(plan, found):
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        _seq_scans(child, found)
+    return found
+
+def check(conn, min_rows=1000):
+    # -> list masalah (string). kosong = aman
+    problems = []
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    missing = pending(cur)
+    for version, name, _ in missing:
+        problems.append(f'migration {version} ({name}) belum dijalanin')
+
+    cur.execute('SELECT tablename, indexname FROM pg_indexes WHERE schemaname = current_schema()')
+    present = {(row['tablename'], row['indexname']) for row in cur.fetchall()}
+    for table, index in EXPECTED_INDEXES:
+        if (table, index) not in present:
+            problems.append(f'index {index} on {table} hilang')
+
+    cur.execute('''
+        SELECT relname, reltuples::bigint AS rows FROM pg_class
+        WHERE relkind = 'r' AND relnamespace = current_schema()::regnamespace
+    ''')
+    sizes = {row['relname']: row['rows'] for row in cur.fetchall()}
+
+    rec = conn.cursor(cursor_factory=_RecordingCursor)
+    rec.recorded = []
+    for label, run, full_scan_ok in _known_queries(rec):
+        rec.recorded = []
+        try:
+            run()
+        except Exception as e:
+            conn.rollback()
+            problems.append(f'{label}: query gagal ({e})')
+            continue
+        for sql in rec.recorded:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            plan = cur.fetchone()['QUERY PLAN']
+            plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+            for table in _seq_scans(plan, []):
+                if not full_scan_ok and sizes.get(table, 0) >= min_rows:
+                    problems.append(f'{label}: seq scan on {table} (~{sizes[table]} rows)')
+    conn.rollback()
+    return problems
+
+
+@click.command('db-migrate')
+@click.option('--dry-run', is_flag=True, help='Cuma tampilin migration yang belum jalan.')
+@with_appcontext
+def migrate_command(dry_run):
+    """Jalanin migration skema yang belum dijalanin."""
+    from app.db import get_db
+    conn, cur = get_db()
+    if dry_run:
+        todo = pending(cur)
+        conn.rollback()
+        for version, name, _ in todo:
+            click.echo(f'{version:>3}  {name}')
+        click.echo(f'{len(todo)} pending')
+        return
+    ran = migrate(conn, cur, log=click.echo)
+    click.echo(f'{len(ran)} migration dijalanin' if ran else 'skema udah paling baru')
+
+
+@click.command('db-check')
+@click.option('--min-rows', default=1000, help='Seq scan di tabel sekecil ini gak dilaporin.')
+@with_appcontext
+def check_command(min_rows):
+    """Cek index yang hilang & seq scan di query-query yang dipake app."""
+    from app.db import get_db
+    conn, cur = get_db()
+    problems = check(conn, min_rows)
+    for problem in problems:
+        click.echo(f'- {problem}')
+    if problems:
+        raise SystemExit(1)
+    click.echo('aman: semua index ada, gak ada seq scan di query yang dicek')
@@ -0,0 +1,46 @@
+from app import geo
+
+# k entry aktif terdekat dari satu titik. kandidat diambil lewat urutan KNN index GiST
+# entries_nearby_idx (point(lon, lat) <-> titik, berhenti di baris ke-k*OVERFETCH),
+# baru jarak great-circle (haversine) dihitung buat kandidat itu aja, diurutin ulang,
+# dan difilter radius. jarak <-> itu jarak derajat datar: di lintang tinggi urutannya
+# agak beda sama haversine, makanya kandidatnya dilebihin. berapa pun radiusnya,
+# index cuma dibaca sampai k*OVERFETCH baris.
+DEFAULT_K = 10
+MAX_K = 50
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 500
+OVERFETCH = 4
+
+NEARBY_SQL = '''
+    SELECT * FROM (
+        SELECT e.id, e.title, e.latitude, e.longitude, e.pin_color, e.created_at,
+               u.username, u.profile_pic,
+               2 * {radius} * asin(least(1, sqrt(
+                   power(sin(radians(e.latitude - %(lat)s) / 2), 2) +
+                   cos(radians(%(lat)s)) * cos(radians(e.latitude)) *
+                   power(sin(radians(e.longitude - %(lon)s) / 2), 2)
+               ))) AS distance_km
+        FROM (
+            SELECT id FROM entries
+            WHERE active = 1 AND id <> %(exclude)s
+            ORDER BY point(longitude, latitude) <-> point(%(lon)s, %(lat)s)
+            LIMIT %(fetch)s
+        ) c
+        JOIN entries e ON e.id = c.id
+        JOIN users u ON e.user_id = u.id
+        WHERE e.latitude IS NOT NULL AND e.longitude IS NOT NULL
+    ) r
+    WHERE distance_km <= %(radius_km)s
+    ORDER BY distance_km, id DESC
+    LIMIT %(k)s
+'''
+
+
+def find(cur, lat, lon, k=DEFAULT_K, radius_km=DEFAULT_RADIUS_KM, exclude=None):
+    # -> list entry terurut dari yang paling deket, tiap baris ada distance_km
+    cur.execute(NEARBY_SQL.format(radius=geo.EARTH_RADIUS_KM), {
+        'lat': lat, 'lon': lon, 'k': k, 'fetch': k * OVERFETCH,
+        'radius_km': min(radius_km, MAX_RADIUS_KM), 'exclude': exclude or 0
+    })
+    return cur.fetchall()
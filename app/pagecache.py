@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+# cache bagian home yang sama buat semua pengunjung (stats, gallery, hasil search).
+# tiap isi cache ditandain "entries generation" (app_counters.entries_generation);
+# semua route yang nulis entries nge-bump angka itu di transaksinya, jadi begitu
+# generation beda, isi cache otomatis dianggap basi di semua worker.
+MAX_ITEMS = 256
+
+_items = OrderedDict()
+_lock = threading.Lock()
+stats = {'hits': 0, 'misses': 0}
+
+
+def generation(cur):
+    # -> (angka generation, waktu terakhir di-bump)
+    cur.execute("SELECT value, updated_at FROM app_counters WHERE name = 'entries_generation'")
+    row = cur.fetchone()
+    if not row:
+        return 0, None
+    return row['value'], row['updated_at']
+
+def bump(cur):
+    # panggil SEBELUM conn.commit() di route yang nulis
+    cur.execute('''
+        UPDATE app_counters SET value = value + 1, updated_at = now()
+        WHERE name = 'entries_generation'
+    ''')
+
+def cached(key, gen, build):
+    with _lock:
+        item = _items.get(key)
+        if item is not None and item[0] == gen:
+            _items.move_to_end(key)
+            stats['hits'] += 1
+            return item[1]
+        stats['misses'] += 1
+
+    value = build()
+    with _lock:
+        _items[key] = (gen, value)
+        _items.move_to_end(key)
+        while len(_items) > MAX_ITEMS:
+            _items.popitem(last=False)
+    return value
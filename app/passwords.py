@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# hashing password (scrypt/pbkdf2) sengaja mahal, jadi gak dijalanin di thread request.
+# tiap worker punya process pool kecil sendiri: jalan paralel di semua core (gak kena GIL),
+# dan antriannya dibatesin biar serbuan login gak numpuk tanpa batas.
+
+
+class PasswordBusy(Exception):
+    pass
+
+
+def _hash(password, method, salt_length):
+    started = time.perf_counter()
+    return generate_password_hash(password, method=method, salt_length=salt_length), time.perf_counter() - started
+
+def _check(stored, password):
+    started = time.perf_counter()
+    return check_password_hash(stored, password), time.perf_counter() - started
+
+
+class Hasher:
+    def __init__(self, method='scrypt:32768:8:1', salt_length=16, workers=2, max_queue=8, timeout=10):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.executor = None
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.stats = {
+            'hashed': 0, 'verified': 0, 'failed_checks': 0, 'rehashed': 0,
+            'rejected': 0, 'timeouts': 0, 'queue_depth': 0, 'max_queue_depth': 0,
+            'run_ms_total': 0.0, 'run_ms_max': 0.0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0
+        }
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            # PASSWORD_WORKERS=0: langsung di thread ini (dev / windows)
+            return self._record(fn(*args), time.perf_counter())
+
+        with self.lock:
+            if self.pending >= self.max_queue:
+                self.stats['rejected'] += 1
+                raise PasswordBusy(f'{self.pending} password jobs queued')
+            self.pending += 1
+            self.stats['queue_depth'] = self.pending
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.pending)
+            if self.executor is None:
+                # spawn, bukan fork: fork dari proses yang punya banyak thread rawan deadlock
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            executor = self.executor
+
+        submitted = time.perf_counter()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._done(None)
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = None
+            raise PasswordBusy('password pool crashed')
+        except Exception:
+            self._done(None)
+            raise
+        # slot antrian baru dilepas pas job-nya beneran selesai (bukan pas caller nyerah):
+        # hash yang udah jalan gak bisa di-cancel, jadi tetep dihitung sampai kelar
+        future.add_done_callback(self._done)
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self.lock:
+                self.stats['timeouts'] += 1
+            raise PasswordBusy(f'password job took longer than {self.timeout}s')
+        except BrokenProcessPool:
+            # proses hashing mati (OOM dll) -> pool dibikin ulang di job berikutnya
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = None
+            raise PasswordBusy('password pool crashed')
+        return self._record(result, submitted)
+
+    def _done(self, future):
+        with self.lock:
+            self.pending -= 1
+            self.stats['queue_depth'] = self.pending
+
+    def _record(self, result, submitted):
+        value, run = result
+        total = time.perf_counter() - submitted
+        with self.lock:
+            for name, secs in (('run', run), ('wait', max(0.0, total - run))):
+                self.stats[f'{name}_ms_total'] += secs * 1000
+                self.stats[f'{name}_ms_max'] = max(self.stats[f'{name}_ms_max'], secs * 1000)
+        return value
+
+    def hash(self, password):
+        value = self._run(_hash, password, self.method, self.salt_length)
+        with self.lock:
+            self.stats['hashed'] += 1
+        return value
+
+    def rehash(self, password):
+        value = self._run(_hash, password, self.method, self.salt_length)
+        with self.lock:
+            self.stats['rehashed'] += 1
+        return value
+
+    def check(self, stored, password):
+        ok = self._run(_check, stored, password)
+        with self.lock:
+            self.stats['verified' if ok else 'failed_checks'] += 1
+        return ok
+
+    def needs_rehash(self, stored):
+        # "scrypt:32768:8:1$salt$hash" -> bandingin bagian method-nya sama setting sekarang
+        method, _, rest = stored.partition('$')
+        salt = rest.partition('$')[0]
+        return method != self.method or len(salt) != self.salt_length
+
+    def snapshot(self):
+        with self.lock:
+            data = dict(self.stats)
+        done = data['hashed'] + data['rehashed'] + data['verified'] + data['failed_checks']
+        data['run_ms_avg'] = data['run_ms_total'] / done if done else 0.0
+        data['wait_ms_avg'] = data['wait_ms_total'] / done if done else 0.0
+        data.update(method=self.method, workers=self.workers, max_queue=self.max_queue)
+        return data
+
+
+_hasher = None
+_hasher_pid = None
+_hasher_lock = threading.Lock()
+
+def get_hasher():
+    global _hasher, _hasher_pid
+    if _hasher is None or _hasher_pid != os.getpid():
+        with _hasher_lock:
+            if _hasher is None or _hasher_pid != os.getpid():
+                workers = int(os.environ.get('PASSWORD_WORKERS', min(os.cpu_count() or 1, 4)))
+                _hasher = Hasher(
+                    method=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+                    salt_length=int(os.environ.get('PASSWORD_SALT_LENGTH', 16)),
+                    workers=workers,
+                    max_queue=int(os.environ.get('PASSWORD_QUEUE_MAX', max(workers, 1) * 4)),
+                    timeout=float(os.environ.get('PASSWORD_TIMEOUT', 10))
+                )
+                _hasher_pid = os.getpid()
+    return _hasher
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+def check_password(stored, password):
+    return get_hasher().check(stored, password)
+
+def upgrade(stored, password):
+    # dipanggil abis login sukses. -> hash baru kalau setting hash udah berubah, selain itu None
+    hasher = get_hasher()
+    if not hasher.needs_rehash(stored):
+        return None
+    try:
+        return hasher.rehash(password)
+    except PasswordBusy:
+        return None  # coba lagi di login berikutnya
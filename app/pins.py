@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+
+# payload peta yang ramping: pin cuma bawa id, koordinat, warna, & avatar, disusun per kolom
+# (array sejajar) biar nama key gak diulang tiap pin. warna & URL avatar yang sama cuma
+# ditulis sekali di `colors` / `avatars`, pin nyimpen index-nya (-1 = avatar default).
+# isi popup (judul, cerita, tag, lagu) baru diambil waktu popup dibuka: /api/entries/<id>.
+PRECISION = 5  # ~1 meter
+
+PIN_SQL = '''
+    SELECT e.id, e.latitude, e.longitude, e.pin_color, u.profile_pic
+    FROM entries e
+    JOIN users u ON e.user_id = u.id
+    WHERE e.id = ANY(%s) AND e.active = 1
+    ORDER BY e.id DESC
+'''
+
+
+def version(cur, entry_id):
+    # -> versi entry aktif (lihat migration 9), None kalau gak ada / diarsip
+    cur.execute('SELECT version FROM entries WHERE id = %s AND active = 1', (entry_id,))
+    row = cur.fetchone()
+    return row['version'] if row else None
+
+def fetch(cur, ids):
+    if not ids:
+        return []
+    cur.execute(PIN_SQL, (list(ids),))
+    return cur.fetchall()
+
+def pack(rows):
+    colors, color_idx = [], {}
+    avatars, avatar_idx = [], {}
+    out = {'id': [], 'lat': [], 'lon': [], 'color': [], 'avatar': [], 'colors': colors, 'avatars': avatars}
+    for row in rows:
+        if row['latitude'] is None or row['longitude'] is None:
+            continue
+        color = row['pin_color'] or '#ff4757'
+        if color not in color_idx:
+            color_idx[color] = len(colors)
+            colors.append(color)
+        avatar = row.get('profile_pic')
+        if avatar and avatar not in avatar_idx:
+            avatar_idx[avatar] = len(avatars)
+            avatars.append(avatar)
+        out['id'].append(row['id'])
+        out['lat'].append(round(row['latitude'], PRECISION))
+        out['lon'].append(round(row['longitude'], PRECISION))
+        out['color'].append(color_idx[color])
+        out['avatar'].append(avatar_idx[avatar] if avatar else -1)
+    return out
+
+
+class DetailCache:
+    # detail entry per id buat popup, LRU per worker. tiap isi ditandain entries.version
+    # entry itu, jadi cuma write ke entry itu (dari worker mana pun) yang bikin isinya basi.
+    def __init__(self, max_items=5000):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, entry_id, version, build):
+        with self.lock:
+            item = self.items.get(entry_id)
+            if item is not None and item[0] == version:
+                self.items.move_to_end(entry_id)
+                self.stats['hits'] += 1
+                return item[1]
+            self.stats['misses'] += 1
+
+        value = build()
+        with self.lock:
+            self.items[entry_id] = (version, value)
+            self.items.move_to_end(entry_id)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        return value
+
+
+details = DetailCache(int(os.environ.get('DETAIL_CACHE_SIZE', 5000)))
@@ -0,0 +1,242 @@
+import os
+import math
+import hashlib
+import psycopg2
+from flask import Blueprint, request, jsonify, current_app, Response, session
+from app.db import get_read_db, read_pool, PoolTimeout
+from app import geo, cluster, tiles, search, feed, export, pins, nearby, heatmap, stream
+
+api_bp = Blueprint('api', __name__)
+
+MAX_PINS = 500
+
+def fetch_entries(cur, ids):
+    if not ids:
+        return []
+    cur.execute(f'''
+        SELECT {feed.ENTRY_COLUMNS}, {feed.TRACK_COLUMNS},
+               u.username, u.profile_pic,
+               string_agg(t.name, ',') as tags_list
+        FROM entries e
+        JOIN users u ON e.user_id = u.id
+        {feed.TRACK_JOIN}
+        LEFT JOIN entry_tags et ON e.id = et.entry_id
+        LEFT JOIN tags t ON et.tag_id = t.id
+        WHERE e.id = ANY(%s) AND e.active = 1
+        GROUP BY e.id, u.id, u.username, u.profile_pic, st.track_id
+        ORDER BY e.created_at DESC
+    ''', (list(ids),))
+    return cur.fetchall()
+
+@api_bp.route('/api/entries')
+def entries_in_view():
+    bbox = geo.parse_bbox(request.args.get('bbox'))
+    if bbox is None:
+        return jsonify({'error': 'bbox harus minLon,minLat,maxLon,maxLat'}), 400
+
+    # leaflet bisa ngirim zoom pecahan (1.5 dst)
+    zoom = request.args.get('zoom', type=float)
+    if zoom is not None and not math.isfinite(zoom):
+        zoom = None
+    limit = max(1, min(request.args.get('limit', MAX_PINS, type=int), MAX_PINS))
+
+    conn, cur = get_read_db()
+    index = geo.get_index(cur)
+
+    # zoom jauh: balikin cluster + pin yang sendirian di selnya
+    if zoom is not None and zoom <= cluster.max_zoom():
+        clusters, singles = cluster.get_clusters(index).query(bbox, math.floor(zoom))
+        total = sum(c['count'] for c in clusters) + len(singles)
+        truncated = len(singles) > limit
+        singles = sorted(singles, reverse=True)[:limit]
+        return jsonify({
+            'zoom': zoom,
+            'total': total,
+            'truncated': truncated,
+            'clusters': clusters,
+            'pins': pins.pack(pins.fetch(cur, singles))
+        })
+
+    ids, total = index.query(bbox, limit)
+    return jsonify({
+        'zoom': zoom,
+        'total': total,
+        'truncated': total > len(ids),
+        'clusters': [],
+        'pins': pins.pack(pins.fetch(cur, ids))
+    })
+
+@api_bp.route('/api/entries/nearby')
+def nearby_entries():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not (math.isfinite(lat) and math.isfinite(lon)) \
+            or abs(lat) > 90 or abs(lon) > 180:
+        return jsonify({'error': 'lat/lon harus angka, lat -90..90, lon -180..180'}), 400
+    k = max(1, min(request.args.get('k', nearby.DEFAULT_K, type=int), nearby.MAX_K))
+    radius_km = request.args.get('radius_km', nearby.DEFAULT_RADIUS_KM, type=float)
+    if not math.isfinite(radius_km) or radius_km <= 0:
+        return jsonify({'error': 'radius_km harus lebih dari 0'}), 400
+    radius_km = min(radius_km, nearby.MAX_RADIUS_KM)
+
+    conn, cur = get_read_db()
+    rows = nearby.find(cur, lat, lon, k, radius_km, exclude=request.args.get('exclude', type=int))
+    return jsonify({'lat': lat, 'lon': lon, 'k': k, 'radius_km': radius_km, 'entries': rows})
+
+@api_bp.route('/api/entries/<int:entry_id>')
+def entry_detail(entry_id):
+    # isi popup peta, diambil waktu popup dibuka
+    # cache & ETag dikunci ke versi entry itu sendiri, write di entry lain gak bikin basi
+    conn, cur = get_read_db()
+    version = pins.version(cur, entry_id)
+    if version is None:
+        return jsonify({'error': 'entry gak ada'}), 404
+    etag = hashlib.sha1(f'{entry_id}:{version}'.encode()).hexdigest()
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        row = pins.details.get(entry_id, version, lambda: next(iter(fetch_entries(cur, [entry_id])), None))
+        if row is None:
+            return jsonify({'error': 'entry gak ada'}), 404
+        resp = jsonify(row)
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True
+    return resp
+
+@api_bp.route('/api/heatmap')
+def heatmap_layer():
+    # kepadatan pin per sel grid buat zoom jauh (app/heatmap.py)
+    bbox = geo.parse_bbox(request.args.get('bbox'))
+    if bbox is None:
+        return jsonify({'error': 'bbox harus minLon,minLat,maxLon,maxLat'}), 400
+    zoom = request.args.get('zoom', 0, type=float)
+    if not math.isfinite(zoom):
+        zoom = 0
+    zoom = max(0, min(zoom, heatmap.max_zoom()))
+
+    conn, cur = get_read_db()
+    data = heatmap.get_grid(geo.get_index(cur)).query(bbox, math.floor(zoom))
+    return jsonify(dict(data, zoom=zoom, max_zoom=heatmap.max_zoom()))
+
+@api_bp.route('/api/search')
+def search_entries():
+    q = request.args.get('q', '').strip()
+    page = search.clamp_page(request.args.get('page', 1, type=int))
+    size = max(1, min(request.args.get('size', search.PAGE_SIZE, type=int), search.PAGE_SIZE))
+
+    conn, cur = get_read_db()
+    rows, has_more = search.search(cur, q, page, size)
+    return jsonify({
+        'q': q,
+        'page': page,
+        'next_page': page + 1 if has_more else None,
+        'entries': rows
+    })
+
+@api_bp.route('/api/feed')
+def public_feed():
+    conn, cur = get_read_db()
+    rows, next_cursor = feed.public_page(cur, request.args.get('before'), _page_size(feed.FEED_PAGE_SIZE))
+    return jsonify({'entries': rows, 'next': next_cursor})
+
+@api_bp.route('/api/my_entries')
+def my_entries():
+    if 'user_id' not in session:
+        return jsonify({'error': 'login dulu'}), 401
+    conn, cur = get_read_db()
+    rows, next_cursor = feed.user_page(cur, session['user_id'], request.args.get('before'), _page_size(feed.USER_PAGE_SIZE))
+    return jsonify({'entries': rows, 'next': next_cursor})
+
+@api_bp.route('/api/entries/export')
+def export_entries():
+    # ?format=ndjson|geojson, ?scope=public (peta publik) | mine (semua entry sendiri)
+    fmt = request.args.get('format', 'ndjson')
+    scope = request.args.get('scope', 'public')
+    if fmt not in export.FORMATS or scope not in ('public', 'mine'):
+        return jsonify({'error': 'format harus ndjson/geojson, scope harus public/mine'}), 400
+    if 'user_id' not in session:
+        return jsonify({'error': 'login dulu'}), 401
+    user_id = session['user_id'] if scope == 'mine' else None
+
+    busy = jsonify({'error': 'lagi banyak yang export, coba lagi bentar'})
+    busy.status_code = 503
+    busy.headers['Retry-After'] = '30'
+    if not export.slots.acquire(blocking=False):
+        return busy
+
+    # koneksi sendiri (bukan g.db) yang dipegang selama streaming dan dibalikin ke pool
+    # waktu generator-nya selesai / ditutup karena client putus
+    try:
+        pool, _ = read_pool()
+        conn = pool.getconn()
+    except (PoolTimeout, psycopg2.Error) as e:
+        export.slots.release()
+        print(f"Export connection error: {e}")
+        return busy
+    held = [conn]
+
+    def release():
+        # bisa kepanggil dua kali (generator selesai + response ditutup), cuma yang pertama yang balikin
+        if held:
+            pool.putconn(held.pop())
+            export.slots.release()
+
+    def generate():
+        try:
+            yield from export.render(fmt, export.rows(conn, user_id))
+        finally:
+            release()
+
+    resp = Response(generate(), mimetype=export.FORMATS[fmt])
+    # generator yang gak pernah mulai (HEAD, client putus duluan) gak ngejalanin finally-nya
+    resp.call_on_close(release)
+    resp.headers['Content-Disposition'] = f'attachment; filename="entries-{scope}.{fmt}"'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+# perubahan pin (added/edited/archived/restored/deleted + koordinat) sebagai Server-Sent Events,
+# biar peta bisa nambal marker di tempat. gak pegang koneksi DB sama sekali.
+@api_bp.route('/api/entries/stream')
+def entry_stream():
+    if not stream.enabled():
+        return jsonify({'error': 'update live lagi dimatiin'}), 404
+    client = stream.hub.connect()
+    if client is None:
+        resp = jsonify({'error': 'koneksi live lagi penuh, coba lagi nanti'})
+        resp.status_code = 503
+        resp.headers['Retry-After'] = '30'
+        return resp
+
+    resp = Response(stream.hub.events(client, stream.max_seconds()), mimetype='text/event-stream')
+    # generator yang gak pernah mulai gak ngejalanin finally-nya, slot client-nya dilepas di sini
+    resp.call_on_close(lambda: stream.hub.disconnect(client))
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+def _page_size(default):
+    return max(1, min(request.args.get('limit', default, type=int), 100))
+
+@api_bp.route('/tiles/<int:z>/<int:x>/<int:y>.json')
+def tile(z, x, y):
+    if not (0 <= z <= tiles.MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'error': 'tile di luar jangkauan'}), 404
+
+    cache = tiles.get_cache()
+    # tile dari index yang udah lewat satu TTL dianggap basi, sama kayak index-nya
+    cached = cache.get((z, x, y), tiles.min_built(geo.index_ttl()))
+    if cached is not None:
+        body, etag = cached
+    else:
+        conn, cur = get_read_db()
+        index = geo.get_index(cur)
+        clusters, ids = tiles.tile_content(z, x, y, index, MAX_PINS)
+        body = current_app.json.dumps({'clusters': clusters, 'pins': pins.pack(pins.fetch(cur, ids))}).encode()
+        etag = cache.put((z, x, y), body, index.built_at)
+
+    # isi tile cuma berubah kalau ada write di koordinat itu, jadi aman di-cache browser
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = int(os.environ.get('TILE_MAX_AGE', 300))
+    return resp.make_conditional(request)
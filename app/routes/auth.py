@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.db import get_db
+from app import changes, pagecache, passwords
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,7 +13,16 @@ def login():
         cur.execute('SELECT * FROM users WHERE username = %s', (username,))
         user = cur.fetchone()
         
-        if user and check_password_hash(user['password'], password):
+        try:
+            valid = user is not None and passwords.check_password(user['password'], password)
+        except passwords.PasswordBusy:
+            return render_template('login.html', error="Lagi rame banget, coba lagi bentar ya."), 503
+
+        if valid:
+            new_hash = passwords.upgrade(user['password'], password)
+            if new_hash:
+                cur.execute('UPDATE users SET password = %s WHERE id = %s AND password = %s', (new_hash, user['id'], user['password']))
+                conn.commit()
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['profile_pic'] = user.get('profile_pic') 
@@ -33,7 +42,10 @@ def register():
         if cur.fetchone():
             return render_template('register.html', error="Username sudah dipakai.")
         
-        hashed_pw = generate_password_hash(password)
+        try:
+            hashed_pw = passwords.hash_password(password)
+        except passwords.PasswordBusy:
+            return render_template('register.html', error="Lagi rame banget, coba lagi bentar ya."), 503
         cur.execute('INSERT INTO users (username, password) VALUES (%s, %s)', (username, hashed_pw))
         conn.commit()
         return redirect(url_for('auth.login'))
@@ -50,8 +62,15 @@ def delete_profile():
     conn, cur = get_db()
     uid = session['user_id']
     cur.execute('DELETE FROM entry_tags WHERE entry_id IN (SELECT id FROM entries WHERE user_id = %s)', (uid,))
-    cur.execute('DELETE FROM entries WHERE user_id = %s', (uid,))
+    cur.execute('''
+        DELETE FROM entries WHERE user_id = %s
+        RETURNING id, user_id, latitude, longitude, pin_color, active
+    ''', (uid,))
+    deleted = cur.fetchall()
     cur.execute('DELETE FROM users WHERE id = %s', (uid,))
+    changes.notify(cur, 'deleted', deleted)
+    pagecache.bump(cur)
     conn.commit()
+    changes.publish_rows('deleted', deleted)
     session.clear()
     return redirect(url_for('main.home'))
\ No newline at end of file
@@ -1,32 +1,10 @@
-import re
 import os
-import requests
-import base64
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify
-from app.db import get_db
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, make_response
+from app.db import get_db, get_read_db
+from app import changes, search, feed, pagecache, tagging, spotify, tracks, importer
 
 entries_bp = Blueprint('entries', __name__)
 
-# spotify helper
-def get_spotify_token():
-    client_id = os.environ.get('SPOTIFY_CLIENT_ID')
-    client_secret = os.environ.get('SPOTIFY_CLIENT_SECRET')
-    
-    if not client_id or not client_secret: 
-        return None
-    
-    auth_str = f"{client_id}:{client_secret}"
-    b64_auth = base64.b64encode(auth_str.encode()).decode()
-    headers = {'Authorization': f'Basic {b64_auth}'}
-    
-    try:
-        response = requests.post('https://accounts.spotify.com/api/token', headers=headers, data={'grant_type': 'client_credentials'}, timeout=5)
-        if response.status_code == 200:
-            return response.json().get('access_token')
-    except Exception as e:
-        print(f"Spotify Token Error: {e}")
-    return None
-
 def login_required(view):
     from functools import wraps
     @wraps(view)
@@ -42,68 +20,8 @@ def spotify_search():
     if not query or len(query) < 2:
         return jsonify([])
     
-    token = get_spotify_token()
-    if not token:
-        return jsonify([])
-    
     try:
-        headers = {'Authorization': f'Bearer {token}'}        
-        track_id_match = re.search(r'(?:track/|spotify:track:)([a-zA-Z0-9]+)', query)
-        
-        if track_id_match:
-            track_id = track_id_match.group(1)
-            
-            resp = requests.get(
-                f'https://api.spotify.com/v1/tracks/{track_id}', 
-                headers=headers,
-                timeout=5
-            )
-            
-            if resp.status_code == 200:
-                item = resp.json()
-                img = ''
-                if item['album']['images']:
-                    img = item['album']['images'][0]['url']
-                
-                return jsonify([{
-                    'id': item['id'],
-                    'name': item['name'],
-                    'artist': item['artists'][0]['name'],
-                    'image': img,
-                    'url': item['external_urls']['spotify'] 
-                }])
-            else:
-                return jsonify([])
-                
-        else:
-            resp = requests.get(
-                'https://api.spotify.com/v1/search',
-                headers=headers,
-                params={'q': query, 'type': 'track', 'limit': 5},
-                timeout=5
-            )
-            
-            if resp.status_code != 200:
-                return jsonify([])
-            
-            data = resp.json()
-            tracks = []
-            
-            for item in data.get('tracks', {}).get('items', []):
-                img = ''
-                if item['album']['images']:
-                    img = item['album']['images'][1]['url'] if len(item['album']['images']) > 1 else item['album']['images'][0]['url']
-                
-                tracks.append({
-                    'id': item['id'],
-                    'name': item['name'],
-                    'artist': item['artists'][0]['name'],
-                    'image': img,
-                    'url': item['external_urls']['spotify'] 
-                })
-            
-            return jsonify(tracks)
-            
+        return jsonify(spotify.lookup(query))
     except Exception as e:
         print(f"Spotify search error: {e}")
         return jsonify([])
@@ -111,10 +29,13 @@ def spotify_search():
 @entries_bp.route('/entries')
 @login_required
 def my_entries():
-    conn, cur = get_db()
-    cur.execute('SELECT * FROM entries WHERE user_id = %s ORDER BY id DESC', (session['user_id'],))
-    entries = cur.fetchall()
-    return render_template('entries.html', entries=entries)
+    conn, cur = get_read_db()
+    entries, next_cursor = feed.user_page(cur, session['user_id'], request.args.get('before'))
+    if request.args.get('partial'):
+        resp = make_response(render_template('_entry_cards.html', entries=entries))
+        resp.headers['X-Next-Cursor'] = next_cursor or ''
+        return resp
+    return render_template('entries.html', entries=entries, next_cursor=next_cursor)
 
 @entries_bp.route('/add_entry', methods=['GET', 'POST'])
 @login_required
@@ -137,36 +58,56 @@ def add_entry():
         except: 
             lat_val, lon_val = None, None
 
+        # spotify ditanya sebelum transaksi write dibuka
+        track = tracks.prepare(get_read_db()[1], spot_url)
         conn, cur = get_db()
+        track_id = tracks.remember(cur, track)
         cur.execute('''
-            INSERT INTO entries (user_id, title, description, image_url, gmaps_link, spotify_url, pin_color, latitude, longitude, active)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 1) RETURNING id
-        ''', (session['user_id'], title, desc, img, gmaps, spot_url, color, lat_val, lon_val))
+            INSERT INTO entries (user_id, title, description, image_url, gmaps_link, spotify_url, spotify_track_id, pin_color, latitude, longitude, active)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
+            RETURNING id, user_id, latitude, longitude, pin_color, active
+        ''', (session['user_id'], title, desc, img, gmaps, spot_url, track_id, color, lat_val, lon_val))
         
-        new_id = cur.fetchone()['id']
+        new_row = cur.fetchone()
+        new_id = new_row['id']
         
-        if tags:
-            for t in [x.replace(' ', '') for x in tags.split(',') if x.strip()]:
-                cur.execute('SELECT id FROM tags WHERE name = %s', (t,))
-                row = cur.fetchone()
-                
-                if row:
-                    tid = row['id']
-                else:
-                    cur.execute('INSERT INTO tags (name) VALUES (%s) RETURNING id', (t,))
-                    result = cur.fetchone() 
-                    tid = result['id']
-                
-                cur.execute('INSERT INTO entry_tags (entry_id, tag_id) VALUES (%s, %s) ON CONFLICT DO NOTHING', (new_id, tid))
+        names = tagging.parse(tags)
+        if names:
+            tagging.link(cur, new_id, tagging.resolve(cur, names).values())
         
+        search.refresh(cur, entry_ids=[new_id])
+        changes.notify(cur, 'added', [new_row])
+        pagecache.bump(cur)
         conn.commit()
+        changes.publish('added', new_row)
         return redirect(url_for('main.home'))
     return render_template('add_entry.html')
 
+@entries_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_entries():
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return render_template('import_entries.html', error='Pilih file dulu'), 400
+        try:
+            fmt = importer.detect(upload.filename, request.form.get('format') or None)
+            conn, cur = get_db()
+            result = importer.load(
+                conn, cur, session['user_id'],
+                importer.records(importer.text_stream(upload.stream), fmt),
+                max_rows=int(os.environ.get('IMPORT_MAX_ROWS', 10000)),
+                dry_run=bool(request.form.get('dry_run'))
+            )
+        except importer.BadFile as e:
+            return render_template('import_entries.html', error=str(e)), 400
+        return render_template('import_entries.html', result=result, dry_run=bool(request.form.get('dry_run')))
+    return render_template('import_entries.html')
+
 @entries_bp.route('/edit_entry/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_entry(id):
-    conn, cur = get_db()
+    conn, cur = get_db() if request.method == 'POST' else get_read_db()
     cur.execute('SELECT * FROM entries WHERE id = %s AND user_id = %s', (id, session['user_id']))
     entry = cur.fetchone()
     
@@ -183,40 +124,36 @@ def edit_entry(id):
             spot_url = new_spot.split('?')[0]
         else:
             spot_url = None
+        # belum ada yang ditulis: transaksi baca di atas ditutup dulu sebelum nanya spotify
+        track_id = tracks.remember(cur, tracks.prepare(cur, spot_url))
 
         cur.execute('''
             UPDATE entries 
-            SET title=%s, description=%s, image_url=%s, gmaps_link=%s, spotify_url=%s, pin_color=%s, latitude=%s, longitude=%s 
+            SET title=%s, description=%s, image_url=%s, gmaps_link=%s, spotify_url=%s, spotify_track_id=%s, pin_color=%s, latitude=%s, longitude=%s,
+                version = version + 1
             WHERE id=%s
+            RETURNING id, user_id, latitude, longitude, pin_color, active
         ''', (
             request.form['title'], 
             request.form.get('description', ''), 
             request.form.get('image_url', ''), 
             request.form.get('gmaps_link', ''), 
             spot_url,  
+            track_id,
             request.form.get('pin_color', '#ff4757'), 
             request.form.get('latitude'), 
             request.form.get('longitude'), 
             id
         ))
+        updated = cur.fetchone()
                 
-        cur.execute('DELETE FROM entry_tags WHERE entry_id = %s', (id,))
-        tags = request.form.get('tags', '')
-        if tags:
-            for t in [x.replace(' ', '') for x in tags.split(',') if x.strip()]:
-                cur.execute('SELECT id FROM tags WHERE name = %s', (t,))
-                row = cur.fetchone()
-                
-                if row:
-                    tid = row['id']
-                else:
-                    cur.execute('INSERT INTO tags (name) VALUES (%s) RETURNING id', (t,))
-                    result = cur.fetchone()
-                    tid = result['id']
-                
-                cur.execute('INSERT INTO entry_tags (entry_id, tag_id) VALUES (%s, %s) ON CONFLICT DO NOTHING', (id, tid))
+        tagging.set_entry_tags(cur, id, tagging.parse(request.form.get('tags', '')))
 
+        search.refresh(cur, entry_ids=[id])
+        changes.notify(cur, 'edited', [updated], old=entry)
+        pagecache.bump(cur)
         conn.commit()
+        changes.publish('edited', updated, old=entry)
         return redirect(url_for('entries.my_entries'))
         
     return render_template('edit_entry.html', entry=entry, existing_tags=existing_tags)
@@ -225,15 +162,38 @@ def edit_entry(id):
 @login_required
 def archive_entry(id):
     conn, cur = get_db()
-    cur.execute('UPDATE entries SET active = CASE WHEN active = 1 THEN 0 ELSE 1 END WHERE id = %s AND user_id = %s', (id, session['user_id']))
+    cur.execute('''
+        UPDATE entries SET active = CASE WHEN active = 1 THEN 0 ELSE 1 END, version = version + 1
+        WHERE id = %s AND user_id = %s
+        RETURNING id, user_id, latitude, longitude, pin_color, active
+    ''', (id, session['user_id']))
+    row = cur.fetchone()
+    if row:
+        changes.notify(cur, 'restored' if row['active'] else 'archived', [row])
+    pagecache.bump(cur)
     conn.commit()
+    if row:
+        changes.publish('restored' if row['active'] else 'archived', row)
     return redirect(url_for('entries.my_entries'))
 
 @entries_bp.route('/delete_entry_permanent/<int:id>', methods=['POST'])
 @login_required
 def delete_entry_permanent(id):
     conn, cur = get_db()
-    cur.execute('DELETE FROM entry_tags WHERE entry_id = %s', (id,))
-    cur.execute('DELETE FROM entries WHERE id = %s AND user_id = %s', (id, session['user_id']))
+    # entry_tags dihapus cuma kalau entry-nya emang punya user ini (trigger counter ikut jalan di sini)
+    cur.execute('''
+        DELETE FROM entry_tags
+        WHERE entry_id IN (SELECT id FROM entries WHERE id = %s AND user_id = %s)
+    ''', (id, session['user_id']))
+    cur.execute('''
+        DELETE FROM entries WHERE id = %s AND user_id = %s
+        RETURNING id, user_id, latitude, longitude, pin_color, active
+    ''', (id, session['user_id']))
+    row = cur.fetchone()
+    if row:
+        changes.notify(cur, 'deleted', [row])
+    pagecache.bump(cur)
     conn.commit()
+    if row:
+        changes.publish('deleted', row)
     return redirect(url_for('entries.my_entries'))
\ No newline at end of file
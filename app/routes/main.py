@@ -1,81 +1,93 @@
-from flask import Blueprint, render_template, request, session
-from app.db import get_db
+from flask import Blueprint, render_template, request, session, make_response
+from markupsafe import Markup
+from app.db import get_read_db
+from app import search, feed, counters, pagecache, pins, heatmap, cluster
 import datetime
+import hashlib
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/', methods=['GET'])
 def home():
-    conn, cur = get_db()
-    
-    now = datetime.datetime.now().hour
-    if 5 <= now < 11: greeting = "Pagi! Udah ngopi?"
-    elif 11 <= now < 15: greeting = "Siang. Panas ya di situ?"
-    elif 15 <= now < 18: greeting = "Sore! Makan dulu enak tuh."
-    else: greeting = "Malem!"
+    conn, cur = get_read_db()
 
-    #stats
-    cur.execute("""
-        SELECT 
-            COUNT(*) as total_stories, 
-            COUNT(DISTINCT user_id) as total_writers 
-        FROM entries 
-        WHERE active = 1
-    """)
-    stats = cur.fetchone()
+    #load more gallery (infinite scroll): cuma kartu-kartunya, cursor berikutnya di header
+    if request.args.get('partial'):
+        page_entries, next_cursor = feed.public_page(cur, request.args.get('before'))
+        resp = make_response(render_template('_story_cards.html', entries=page_entries))
+        resp.headers['X-Next-Cursor'] = next_cursor or ''
+        return resp
     
-    total_stories = stats['total_stories']
-    total_writers = stats['total_writers']
+    now = datetime.datetime.now()
+    if 5 <= now.hour < 11: greeting = "Pagi! Udah ngopi?"
+    elif 11 <= now.hour < 15: greeting = "Siang. Panas ya di situ?"
+    elif 15 <= now.hour < 18: greeting = "Sore! Makan dulu enak tuh."
+    else: greeting = "Malem!"
 
-    #data entries and tags
     query = request.args.get('q', '').strip()
+    page = search.clamp_page(request.args.get('page', 1, type=int))
+    before = request.args.get('before')
+
+    #conditional GET: isi halaman cuma berubah kalau ada write (generation), ganti sapaan, atau ganti user
+    gen, gen_time = pagecache.generation(cur)
+    etag = hashlib.sha1(repr((
+        gen, greeting, query, page, before,
+        session.get('user_id'), session.get('username'), session.get('profile_pic')
+    )).encode()).hexdigest()
+    last_modified = now.replace(minute=0, second=0, microsecond=0).astimezone(datetime.timezone.utc)
+    if gen_time is not None:
+        last_modified = max(last_modified, gen_time)
+
+    if etag in request.if_none_match:
+        resp = make_response('', 304)
+    else:
+        resp = make_response(render_home(cur, gen, greeting, query, page, before))
+    resp.set_etag(etag)
+    resp.last_modified = last_modified
+    # isinya beda per user (sidebar, nama di navbar): cache bersama (proxy/CDN) jangan nyimpen
+    resp.cache_control.no_cache = True
+    resp.cache_control.private = True
+    resp.vary.add('Cookie')
+    return resp
+
+def render_home(cur, gen, greeting, query, page, before):
+    #stats: counter yang di-maintain trigger (app/counters.py), bukan COUNT(*) tiap request
+    stats = pagecache.cached('stats', gen, lambda: counters.global_stats(cur))
+
+    #data entries and tags (bagian yang sama buat semua orang, di-cache per generation)
+    has_more = False
+    next_cursor = None
+    gallery_html = None
     
     if query:
-        #search
-        search_term = f"%{query}%"
-        cur.execute('''
-            SELECT e.*, u.username, u.profile_pic,
-            string_agg(t.name, ',') as tags_list
-            FROM entries e 
-            JOIN users u ON e.user_id = u.id 
-            LEFT JOIN entry_tags et ON e.id = et.entry_id
-            LEFT JOIN tags t ON et.tag_id = t.id
-            WHERE e.active = 1 AND (
-                e.title ILIKE %s OR 
-                e.description ILIKE %s OR
-                u.username ILIKE %s OR
-                t.name ILIKE %s
-            )
-            GROUP BY e.id, u.id, u.username, u.profile_pic
-            ORDER BY e.created_at DESC
-        ''', (search_term, search_term, search_term, search_term))
+        #search: full-text lewat entries.search_doc (app/search.py)
+        all_entries, has_more = pagecache.cached(('search', query.lower(), page), gen,
+                                                 lambda: search.search(cur, query, page))
     else:
-        #home
-        cur.execute('''
-            SELECT e.*, u.username, u.profile_pic,
-            string_agg(t.name, ',') as tags_list
-            FROM entries e 
-            JOIN users u ON e.user_id = u.id 
-            LEFT JOIN entry_tags et ON e.id = et.entry_id
-            LEFT JOIN tags t ON et.tag_id = t.id
-            WHERE e.active = 1
-            GROUP BY e.id, u.id, u.username, u.profile_pic
-            ORDER BY e.created_at DESC
-        ''')
-    
-    all_entries = cur.fetchall()
+        #home: satu halaman gallery (keyset), pin peta diambil per tile
+        def build_gallery():
+            rows, cursor = feed.public_page(cur, before)
+            return rows, cursor, render_template('_story_cards.html', entries=rows[:10])
+        all_entries, next_cursor, html = pagecache.cached(('gallery', before), gen, build_gallery)
+        gallery_html = Markup(html)
 
     #sidebar
     user_entries = []
     if 'user_id' in session:
-        cur.execute('SELECT * FROM entries WHERE user_id = %s AND active = 1 ORDER BY id DESC', (session['user_id'],))
-        user_entries = cur.fetchall()
+        user_entries, _ = feed.user_page(cur, session['user_id'], limit=5, active_only=True)
 
     return render_template('home.html', 
                            all_entries=all_entries, 
-                           json_all_entries=all_entries, 
+                           json_pins=pins.pack(all_entries) if query else pins.pack([]),
+                           viewport_map=not query,
+                           heat_max_zoom=heatmap.max_zoom(),
+                           cluster_max_zoom=cluster.max_zoom(),
+                           gallery_html=gallery_html,
                            user_entries=user_entries, 
                            query=query,
+                           page=page,
+                           has_more=has_more,
+                           next_cursor=next_cursor,
                            greeting=greeting,
-                           total_stories=total_stories,
-                           total_writers=total_writers)
\ No newline at end of file
+                           total_stories=stats['total_stories'],
+                           total_writers=stats['total_writers'])
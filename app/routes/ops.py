@@ -0,0 +1,82 @@
+import os
+import hmac
+from flask import Blueprint, jsonify, Response, request, abort
+from app.db import pool_stats, replica_stats
+from app import spotify, passwords, metrics, pagecache, tagging, tiles, pins, heatmap, stream
+
+ops_bp = Blueprint('ops', __name__)
+
+LOCAL_ADDRS = ('127.0.0.1', '::1')
+
+# isinya host replica, state pool, umur token, & teks SQL: jangan kebuka di port publik.
+# OPS_TOKEN diset -> wajib `Authorization: Bearer <token>` (atau ?token=);
+# gak diset -> cuma dari localhost. selain itu dibales 404.
+@ops_bp.before_request
+def require_ops_access():
+    token = os.environ.get('OPS_TOKEN')
+    if token:
+        given = request.headers.get('Authorization', '').removeprefix('Bearer ').strip() or request.args.get('token', '')
+        if hmac.compare_digest(given.encode(), token.encode()):
+            return None
+    elif request.remote_addr in LOCAL_ADDRS:
+        return None
+    abort(404)
+
+# statistik pool koneksi worker yang lagi jawab request ini
+@ops_bp.route('/ops/pool')
+def pool():
+    return jsonify({'pid': os.getpid(), 'pool': pool_stats(), 'replicas': replica_stats()})
+
+# token spotify + cache hasil search di worker ini
+@ops_bp.route('/ops/spotify')
+def spotify_stats():
+    manager = spotify.get_token_manager()
+    cache = spotify.results
+    return jsonify({
+        'pid': os.getpid(),
+        'token': dict(manager.stats) if manager else None,
+        'upstream': dict(spotify.get_upstream().stats),
+        'cache': dict(cache.stats, size=len(cache.items), max=cache.max_items)
+    })
+
+# antrian & waktu hashing password di worker ini
+@ops_bp.route('/ops/passwords')
+def password_stats():
+    return jsonify({'pid': os.getpid(), 'hasher': passwords.get_hasher().snapshot()})
+
+# format prometheus: histogram request/SQL/template/spotify + angka stats di atas
+@ops_bp.route('/metrics')
+def prometheus():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@metrics.gauges
+def _stats_gauges():
+    sources = [
+        ('mouthings_db_pool', 'Statistik pool koneksi PostgreSQL.', pool_stats()),
+        ('mouthings_spotify_cache', 'Cache hasil search Spotify.', spotify.results.stats),
+        ('mouthings_spotify_upstream', 'Client HTTP ke Spotify.', spotify.get_upstream().stats),
+        ('mouthings_page_cache', 'Cache potongan halaman home.', pagecache.stats),
+        ('mouthings_tag_cache', 'Cache id tag.', tagging.cache.stats),
+        ('mouthings_tile_cache', 'Cache tile peta.', tiles.get_cache().stats),
+        ('mouthings_entry_detail_cache', 'Cache detail entry buat popup peta.', pins.details.stats),
+        ('mouthings_password_hasher', 'Antrian hashing password.', passwords.get_hasher().snapshot()),
+        ('mouthings_live_clients', 'Client SSE update pin live.', stream.hub.stats),
+        ('mouthings_live_listener', 'Listener LISTEN/NOTIFY perubahan entries.', stream.listener_stats())
+    ]
+    for name, help, stats in sources:
+        for key, value in (stats or {}).items():
+            if isinstance(value, (int, float)):
+                yield name, help, {'stat': key}, value
+
+    yield 'mouthings_heatmap_points', 'Jumlah pin di grid kepadatan worker ini.', {}, heatmap.point_count()
+    yield 'mouthings_live_connected', 'Client SSE yang lagi nyambung ke worker ini.', {}, len(stream.hub.clients)
+
+    replicas = replica_stats()
+    for replica in (replicas or {}).get('replicas', []):
+        labels = {'replica': replica['name']}
+        yield 'mouthings_db_replica_healthy', 'Replica baca lagi dipake (1) atau lagi dianggap mati (0).', labels, replica['healthy']
+        yield 'mouthings_db_replica_lag_seconds', 'Lag replay replica waktu terakhir dicek.', labels, replica['lag']
+        for key in ('reads', 'failures', 'lagging'):
+            yield 'mouthings_db_replica', 'Statistik replica baca.', dict(labels, stat=key), replica[key]
+    if replicas:
+        yield 'mouthings_db_replica_fallbacks', 'Baca yang balik ke primary karena gak ada replica sehat.', {}, replicas['fallbacks']
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.db import get_db
-from werkzeug.security import generate_password_hash
+from app.db import get_db, get_read_db
+from app import changes, search, counters, pagecache, passwords
 from functools import wraps
 
 profile_bp = Blueprint('profile', __name__)
@@ -15,7 +15,7 @@ def login_required(view):
 @profile_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    conn, cur = get_db()
+    conn, cur = get_db() if request.method == 'POST' else get_read_db()
     user_id = session['user_id']
 
     if request.method == 'POST':
@@ -24,12 +24,26 @@ def profile():
         password = request.form['password']
 
         if password:
-            hashed_pw = generate_password_hash(password)
+            try:
+                hashed_pw = passwords.hash_password(password)
+            except passwords.PasswordBusy:
+                flash('Lagi rame banget, password belum keganti. Coba lagi bentar ya.')
+                return redirect(url_for('profile.profile'))
             cur.execute('UPDATE users SET username=%s, profile_pic=%s, password=%s WHERE id=%s', (username, profile_pic, hashed_pw, user_id))
         else:
             cur.execute('UPDATE users SET username=%s, profile_pic=%s WHERE id=%s', (username, profile_pic, user_id))
         
+        # username/foto ikut kebawa di pin & popup, jadi semua entry user ini dianggap berubah
+        cur.execute('''
+            UPDATE entries SET version = version + 1 WHERE user_id = %s
+            RETURNING id, user_id, latitude, longitude, pin_color, active
+        ''', (user_id,))
+        pins = [row for row in cur.fetchall() if row['active']]
+        search.refresh(cur, user_id=user_id)
+        changes.notify(cur, 'edited', pins)
+        pagecache.bump(cur)
         conn.commit()
+        changes.publish_rows('edited', pins)
         session['username'] = username
         session['profile_pic'] = profile_pic  # session update
         return redirect(url_for('profile.profile'))
@@ -37,17 +51,7 @@ def profile():
     cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
     user_data = dict(cur.fetchone())
 
-    cur.execute("SELECT COUNT(*) as c FROM entries WHERE user_id = %s AND active = 1", (user_id,))
-    user_data['entry_count'] = cur.fetchone()['c']
-
-    cur.execute("""
-        SELECT COUNT(DISTINCT t.id) as c
-        FROM tags t
-        JOIN entry_tags et ON t.id = et.tag_id
-        JOIN entries e ON et.entry_id = e.id
-        WHERE e.user_id = %s AND e.active = 1
-    """, (user_id,))
-    user_data['tag_count'] = cur.fetchone()['c']
+    user_data.update(counters.user_stats(cur, user_id))
 
     return render_template('profile.html', user=user_data)
 
@@ -56,6 +60,13 @@ def profile():
 def archive_all_entries():
     conn, cur = get_db()
     user_id = session['user_id']
-    cur.execute('UPDATE entries SET active = 0 WHERE user_id = %s', (user_id,))
+    cur.execute('''
+        UPDATE entries SET active = 0, version = version + 1 WHERE user_id = %s AND active = 1
+        RETURNING id, user_id, latitude, longitude, pin_color, active
+    ''', (user_id,))
+    archived = cur.fetchall()
+    changes.notify(cur, 'archived', archived)
+    pagecache.bump(cur)
     conn.commit()
+    changes.publish_rows('archived', archived)
     return redirect(url_for('profile.profile'))
\ No newline at end of file
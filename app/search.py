@@ -0,0 +1,93 @@
+import re
+import click
+from flask.cli import with_appcontext
+from app.feed import ENTRY_COLUMNS, TRACK_COLUMNS, TRACK_JOIN
+
+PAGE_SIZE = 50
+# hasil diurutin relevansi jadi gak bisa pake cursor keyset kayak feed; OFFSET dalem itu
+# mahal (dan angka page gede bisa overflow bigint), jadi halamannya dibatesin
+MAX_PAGE = 20
+
+# dokumen pencarian per entry disimpan di entries.search_doc (tsvector, index GIN).
+# config 'simple' soalnya isinya campur indo/inggris/slang, stemming malah ngerusak.
+REFRESH_SQL = '''
+    UPDATE entries e SET search_doc =
+        setweight(to_tsvector('simple', coalesce(e.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(u.username, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(t.name, ' ')
+            FROM entry_tags et JOIN tags t ON t.id = et.tag_id
+            WHERE et.entry_id = e.id
+        ), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(e.description, '')), 'C')
+    FROM users u
+    WHERE u.id = e.user_id
+'''
+
+
+def refresh(cur, entry_ids=None, user_id=None):
+    # dipanggil di transaksi yang sama dengan write-nya, sebelum commit
+    if entry_ids is not None:
+        cur.execute(REFRESH_SQL + ' AND e.id = ANY(%s)', (list(entry_ids),))
+    elif user_id is not None:
+        cur.execute(REFRESH_SQL + ' AND e.user_id = %s', (user_id,))
+
+def backfill(cur, batch=5000, missing_only=False, commit=None):
+    # isi search_doc per rentang id biar satu UPDATE gak ngunci semua baris sekaligus.
+    # commit: dipanggil tiap batch (CLI); migration jalan dalam satu transaksi, jadi None
+    cur.execute('SELECT coalesce(min(id), 0) AS lo, coalesce(max(id), 0) AS hi FROM entries')
+    bounds = cur.fetchone()
+    where = ' AND e.id >= %s AND e.id < %s' + (' AND e.search_doc IS NULL' if missing_only else '')
+    done = 0
+    for start in range(bounds['lo'], bounds['hi'] + 1, batch):
+        cur.execute(REFRESH_SQL + where, (start, start + batch))
+        done += cur.rowcount
+        if commit:
+            commit()
+    return done
+
+def to_tsquery_text(q):
+    # "kopi senja" -> "kopi:* & senja:*" (prefix match, biar kerasa kayak ILIKE)
+    words = re.findall(r'\w+', q.lower())[:8]
+    return ' & '.join(f'{w}:*' for w in words)
+
+def clamp_page(page):
+    return max(1, min(page or 1, MAX_PAGE))
+
+def search(cur, q, page=1, page_size=PAGE_SIZE):
+    # -> (rows, has_more). diurutin relevansi, terus yang terbaru
+    page = clamp_page(page)
+    tsq = to_tsquery_text(q)
+    if not tsq:
+        return [], False
+
+    cur.execute(f'''
+        SELECT {ENTRY_COLUMNS}, {TRACK_COLUMNS},
+               u.username, u.profile_pic, tl.tags_list,
+               ts_rank_cd(e.search_doc, query) AS rank
+        FROM entries e
+        JOIN users u ON e.user_id = u.id
+        CROSS JOIN to_tsquery('simple', %s) query
+        {TRACK_JOIN}
+        LEFT JOIN LATERAL (
+            SELECT string_agg(t.name, ',') AS tags_list
+            FROM entry_tags et JOIN tags t ON et.tag_id = t.id
+            WHERE et.entry_id = e.id
+        ) tl ON true
+        WHERE e.active = 1 AND e.search_doc @@ query
+        ORDER BY rank DESC, e.created_at DESC, e.id DESC
+        LIMIT %s OFFSET %s
+    ''', (tsq, page_size + 1, (page - 1) * page_size))
+    rows = cur.fetchall()
+    return rows[:page_size], len(rows) > page_size and page < MAX_PAGE
+
+
+@click.command('search-reindex')
+@click.option('--batch', default=5000, help='Jumlah entry per UPDATE.')
+@with_appcontext
+def reindex_command(batch):
+    """Bangun ulang entries.search_doc buat semua entry."""
+    from app.db import get_db
+    conn, cur = get_db()
+    done = backfill(cur, batch, commit=conn.commit)
+    click.echo(f'{done} entries reindexed')
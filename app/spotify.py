@@ -0,0 +1,420 @@
+import os
+import json
+import time
+import base64
+import tempfile
+import re
+import threading
+from collections import OrderedDict
+import requests
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from app import metrics
+
+try:
+    import fcntl
+except ImportError:  # windows (dev doang), lock antar proses di-skip
+    fcntl = None
+
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+API_URL = 'https://api.spotify.com/v1'
+TRACK_ID_RE = re.compile(r'(?:track/|spotify:track:)([a-zA-Z0-9]+)')
+
+
+class SpotifyError(Exception):
+    pass
+
+
+class RateLimited(SpotifyError):
+    def __init__(self, retry_after):
+        super().__init__(f'rate limited, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class Upstream:
+    # satu requests.Session per proses: koneksi TLS ke spotify dipake ulang (keep-alive),
+    # dan jumlah request yang jalan barengan dibatesin. kalau semua slot kepake, request
+    # baru nunggu sebentar lalu nyerah (cache hasil search bakal balikin versi lama).
+    def __init__(self, max_concurrency=4, queue_timeout=2, connect_timeout=3, read_timeout=5):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.timeout = (connect_timeout, read_timeout)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'in_flight': 0, 'rejected': 0, 'failed': 0}
+
+    def request(self, method, url, **kwargs):
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            with self.lock:
+                self.stats['rejected'] += 1
+            raise SpotifyError(f'{self.max_concurrency} spotify calls already in flight')
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            status = str(resp.status_code)
+            return resp
+        except requests.RequestException:
+            with self.lock:
+                self.stats['failed'] += 1
+            raise
+        finally:
+            metrics.spotify_seconds.observe(time.perf_counter() - started, _endpoint_label(url), status)
+            with self.lock:
+                self.stats['in_flight'] -= 1
+            self.slots.release()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+def _endpoint_label(url):
+    # /v1/tracks/4uLU6h... -> /v1/tracks/:id biar label-nya gak meledak
+    path = urlparse(url).path
+    return re.sub(r'/tracks/[^/]+$', '/tracks/:id', path)
+
+
+_upstream = None
+_upstream_pid = None
+_upstream_lock = threading.Lock()
+
+def get_upstream():
+    global _upstream, _upstream_pid
+    if _upstream is None or _upstream_pid != os.getpid():
+        with _upstream_lock:
+            if _upstream is None or _upstream_pid != os.getpid():
+                _upstream = Upstream(
+                    max_concurrency=int(os.environ.get('SPOTIFY_MAX_CONCURRENCY', 4)),
+                    queue_timeout=float(os.environ.get('SPOTIFY_QUEUE_TIMEOUT', 2)),
+                    connect_timeout=float(os.environ.get('SPOTIFY_CONNECT_TIMEOUT', 3)),
+                    read_timeout=float(os.environ.get('SPOTIFY_READ_TIMEOUT', 5))
+                )
+                _upstream_pid = os.getpid()
+    return _upstream
+
+
+class TokenManager:
+    # token client-credentials spotify, di-cache sampe mepet expires_in.
+    # - di satu worker: cuma satu thread yang refresh (single-flight), sisanya nunggu/pake token lama
+    # - antar worker: token disimpen di file + flock, jadi worker lain tinggal baca
+    # - kalau token udah masuk jendela refresh_ahead, di-refresh di background sebelum expired
+    def __init__(self, client_id, client_secret, token_url=TOKEN_URL, cache_path=None,
+                 margin=60, refresh_ahead=300):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.cache_path = cache_path
+        self.margin = margin
+        self.refresh_ahead = refresh_ahead
+
+        self.token = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.retry_at = 0.0
+        self.rejected = None
+        self.stats = {'fetched': 0, 'shared_reads': 0, 'background_refreshes': 0, 'errors': 0}
+
+    def _valid(self, ahead=0):
+        return self.token is not None and time.time() < self.expires_at - self.margin - ahead
+
+    def get(self):
+        if self._valid():
+            if not self._valid(self.refresh_ahead):
+                self._refresh_in_background()
+            return self.token
+
+        with self.lock:
+            # abis gagal refresh, jangan langsung nyerbu token endpoint lagi
+            if not self._valid() and time.time() >= self.retry_at:
+                self._refresh()
+            return self.token if self._valid() else None
+
+    def invalidate(self, token):
+        # dipanggil kalau API bales 401 buat token ini
+        with self.lock:
+            self.rejected = token
+            if self.token == token:
+                self.token, self.expires_at = None, 0.0
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                with self.lock:
+                    if not self._valid(self.refresh_ahead):
+                        self._refresh(ahead=self.refresh_ahead)
+                        self.stats['background_refreshes'] += 1
+            finally:
+                self.refreshing = False
+
+        threading.Thread(target=run, name='spotify-token-refresh', daemon=True).start()
+
+    def _refresh(self, ahead=0):
+        # dipanggil dengan self.lock kepegang
+        lock_file = None
+        try:
+            if self.cache_path and fcntl is not None:
+                lock_file = open(self.cache_path + '.lock', 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # bisa jadi worker lain udah refresh duluan selama kita nunggu lock
+            if self._read_shared() and self._valid(ahead):
+                self.stats['shared_reads'] += 1
+                return
+
+            token, expires_in = self._fetch()
+            if token:
+                self.token, self.expires_at = token, time.time() + expires_in
+                self.stats['fetched'] += 1
+                self._write_shared()
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.retry_at = time.time() + 5
+            print(f"Spotify Token Error: {e}")
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _fetch(self):
+        auth_str = f"{self.client_id}:{self.client_secret}"
+        b64_auth = base64.b64encode(auth_str.encode()).decode()
+        headers = {'Authorization': f'Basic {b64_auth}'}
+        response = get_upstream().post(self.token_url, headers=headers, data={'grant_type': 'client_credentials'})
+        if response.status_code != 200:
+            raise RuntimeError(f'token endpoint returned {response.status_code}')
+        data = response.json()
+        return data.get('access_token'), float(data.get('expires_in', 3600))
+
+    def _read_shared(self):
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('client_id') != self.client_id or data.get('access_token') == self.rejected:
+            return False
+        if data.get('expires_at', 0) <= self.expires_at:
+            return False
+        self.token, self.expires_at = data['access_token'], float(data['expires_at'])
+        return True
+
+    def _write_shared(self):
+        if not self.cache_path:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.cache_path) or '.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'client_id': self.client_id, 'access_token': self.token, 'expires_at': self.expires_at}, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"Spotify token cache write error: {e}")
+
+
+_tokens = None
+_tokens_pid = None
+_tokens_lock = threading.Lock()
+
+def get_token_manager():
+    global _tokens, _tokens_pid
+    client_id = os.environ.get('SPOTIFY_CLIENT_ID')
+    client_secret = os.environ.get('SPOTIFY_CLIENT_SECRET')
+    if not client_id or not client_secret:
+        return None
+
+    if _tokens is None or _tokens_pid != os.getpid():
+        with _tokens_lock:
+            if _tokens is None or _tokens_pid != os.getpid():
+                _tokens = TokenManager(
+                    client_id, client_secret,
+                    token_url=os.environ.get('SPOTIFY_TOKEN_URL', TOKEN_URL),
+                    cache_path=os.environ.get('SPOTIFY_TOKEN_CACHE') or os.path.join(tempfile.gettempdir(), 'mouthings-spotify-token.json'),
+                    margin=float(os.environ.get('SPOTIFY_TOKEN_MARGIN', 60)),
+                    refresh_ahead=float(os.environ.get('SPOTIFY_TOKEN_REFRESH_AHEAD', 300))
+                )
+                _tokens_pid = os.getpid()
+    return _tokens
+
+def get_token():
+    manager = get_token_manager()
+    return manager.get() if manager else None
+
+
+class ResultCache:
+    # cache TTL + LRU buat hasil search/track.
+    # - umur < ttl: langsung dipake (hit)
+    # - ttl < umur < stale_ttl: dipake juga (stale), tapi di-revalidate di background
+    # - kalau spotify error/lemot dan ada versi lama, versi lama yang dibalikin
+    # - lookup yang sama barengan cuma nembak spotify sekali (coalescing)
+    def __init__(self, max_items=2000, ttl=600, stale_ttl=86400, wait_timeout=6):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.wait_timeout = wait_timeout
+        self.items = OrderedDict()  # key -> (value, fetched_at)
+        self.inflight = {}  # key -> threading.Event
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'errors': 0, 'stale_on_error': 0}
+
+    def _store(self, key, value):
+        with self.lock:
+            self.items[key] = (value, time.time())
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def _fetch_once(self, key, fetch):
+        # -> (value, error). yang pertama dateng jadi "leader", sisanya nunggu hasilnya
+        with self.lock:
+            event = self.inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self.inflight[key] = threading.Event()
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            event.wait(self.wait_timeout)
+            with self.lock:
+                item = self.items.get(key)
+            if item is not None:
+                return item[0], None
+            return None, SpotifyError('coalesced lookup failed')
+
+        try:
+            value = fetch()
+            self._store(key, value)
+            return value, None
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            return None, e
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            event.set()
+
+    def get(self, key, fetch):
+        now = time.time()
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                self.items.move_to_end(key)
+                age = now - item[1]
+                if age < self.ttl:
+                    self.stats['hits'] += 1
+                    return item[0]
+                if age < self.stale_ttl:
+                    self.stats['stale'] += 1
+                    revalidating = key in self.inflight
+                else:
+                    item = None
+            if item is None:
+                self.stats['misses'] += 1
+
+        if item is not None:
+            if not revalidating:
+                threading.Thread(target=self._fetch_once, args=(key, fetch), daemon=True).start()
+            return item[0]
+
+        value, error = self._fetch_once(key, fetch)
+        if error is None:
+            return value
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                self.stats['stale_on_error'] += 1
+                return item[0]
+        raise error
+
+
+def _api_get(path, params=None):
+    token = get_token()
+    if not token:
+        raise SpotifyError('no token')
+    resp = get_upstream().get(
+        os.environ.get('SPOTIFY_API_URL', API_URL) + path,
+        headers={'Authorization': f'Bearer {token}'},
+        params=params
+    )
+    if resp.status_code == 401:
+        get_token_manager().invalidate(token)
+    if resp.status_code == 429:
+        raise RateLimited(float(resp.headers.get('Retry-After', 5)))
+    return resp
+
+def _track_dict(item, image_index=0):
+    img = ''
+    images = item['album']['images']
+    if images:
+        img = images[image_index]['url'] if len(images) > image_index else images[0]['url']
+    return {
+        'id': item['id'],
+        'name': item['name'],
+        'artist': item['artists'][0]['name'],
+        'album': item['album'].get('name'),
+        'image': img,
+        'duration_ms': item.get('duration_ms'),
+        'url': item['external_urls']['spotify']
+    }
+
+def fetch_track(track_id):
+    resp = _api_get(f'/tracks/{track_id}')
+    if resp.status_code in (400, 404):
+        return []
+    if resp.status_code != 200:
+        raise SpotifyError(f'tracks returned {resp.status_code}')
+    return [_track_dict(resp.json())]
+
+def fetch_tracks(track_ids):
+    # batch endpoint, max 50 id per request. -> {track_id: dict atau None kalau gak ketemu}
+    resp = _api_get('/tracks', {'ids': ','.join(track_ids)})
+    if resp.status_code != 200:
+        raise SpotifyError(f'tracks returned {resp.status_code}')
+    found = {item['id']: _track_dict(item) for item in resp.json().get('tracks', []) if item}
+    return {track_id: found.get(track_id) for track_id in track_ids}
+
+def fetch_search(query):
+    resp = _api_get('/search', {'q': query, 'type': 'track', 'limit': 5})
+    if resp.status_code != 200:
+        raise SpotifyError(f'search returned {resp.status_code}')
+    items = resp.json().get('tracks', {}).get('items', [])
+    return [_track_dict(item, 1) for item in items]
+
+
+results = ResultCache(
+    max_items=int(os.environ.get('SPOTIFY_CACHE_SIZE', 2000)),
+    ttl=float(os.environ.get('SPOTIFY_CACHE_TTL', 600)),
+    stale_ttl=float(os.environ.get('SPOTIFY_CACHE_STALE', 86400))
+)
+
+def track_id(url):
+    match = TRACK_ID_RE.search(url or '')
+    return match.group(1) if match else None
+
+def lookup(query):
+    # link/URI track -> detail track itu, selain itu -> search. hasilnya list track
+    tid = track_id(query)
+    if tid:
+        return results.get(('track', tid), lambda: fetch_track(tid))
+
+    normalized = ' '.join(query.lower().split())
+    return results.get(('search', normalized), lambda: fetch_search(normalized))
+
@@ -0,0 +1,53 @@
+// panel "cerita di sekitar sini" di add/edit entry: beberapa entry terdekat dari titik yang dipilih
+let nearbyTimer;
+let nearbyAbort;
+
+function formatDistance(km) {
+    return km < 1 ? `${Math.round(km * 1000)} m` : `${km.toFixed(1)} km`;
+}
+
+function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+}
+
+// isi dari user (judul, username, warna) gak pernah lewat innerHTML
+function renderNearby(panel, entries) {
+    panel.style.display = 'block';
+    if (!entries.length) {
+        panel.innerHTML = '<small style="color:#666;">Belum ada cerita lain di sekitar sini. Jadi yang pertama!</small>';
+        return;
+    }
+    panel.replaceChildren(el('label', '', 'Cerita di sekitar sini'));
+    entries.forEach(e => {
+        const item = el('div', 'nearby-item');
+        const dot = el('span', 'nearby-dot');
+        dot.style.background = e.pin_color || '#ff4757';
+        const meta = el('span', 'nearby-meta');
+        meta.append(el('strong', '', e.title), el('small', '', `@${e.username} · ${formatDistance(e.distance_km)}`));
+        item.append(dot, meta);
+        panel.appendChild(item);
+    });
+}
+
+function loadNearby(lat, lon) {
+    const panel = document.getElementById('nearby-panel');
+    lat = parseFloat(lat);
+    lon = parseFloat(lon);
+    if (!panel || isNaN(lat) || isNaN(lon)) return;
+
+    // klik peta beruntun cukup sekali request
+    clearTimeout(nearbyTimer);
+    nearbyTimer = setTimeout(() => {
+        if (nearbyAbort) nearbyAbort.abort();
+        nearbyAbort = new AbortController();
+        const params = new URLSearchParams({lat: lat, lon: lon, k: 5, radius_km: 25});
+        if (panel.dataset.exclude) params.set('exclude', panel.dataset.exclude);
+        fetch(`/api/entries/nearby?${params}`, {signal: nearbyAbort.signal})
+            .then(res => res.json())
+            .then(data => renderNearby(panel, data.entries || []))
+            .catch(() => {});
+    }, 250);
+}
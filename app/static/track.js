@@ -0,0 +1,43 @@
+// kartu lagu spotify: cover + judul + artis dari DB (spotify_tracks),
+// iframe embed spotify yang berat baru dimuat kalau kartunya diklik.
+function trackIdFromUrl(url) {
+    const match = (url || '').match(/track[\/:]([a-zA-Z0-9]+)/);
+    return match ? match[1] : null;
+}
+
+function formatDuration(ms) {
+    if (!ms) return '';
+    const secs = Math.floor(ms / 1000);
+    return `${Math.floor(secs / 60)}:${String(secs % 60).padStart(2, '0')}`;
+}
+
+function trackCardHtml(item) {
+    const trackId = item.spotify_track_id || trackIdFromUrl(item.spotify_url);
+    if (!trackId) return '';
+
+    const cover = item.track_image
+        ? `<img src="${item.track_image}" loading="lazy" alt="">`
+        : `<span class="track-cover"><i class="fab fa-spotify"></i></span>`;
+    const duration = formatDuration(item.track_duration_ms);
+    const sub = item.track_artist
+        ? `${item.track_artist}${duration ? ' · ' + duration : ''}`
+        : 'Spotify';
+
+    return `
+        <button type="button" class="track-card" data-track="${trackId}" onclick="loadTrackEmbed(this)">
+            ${cover}
+            <span class="track-meta">
+                <strong>${item.track_name || 'Dengerin lagunya'}</strong>
+                <small>${sub}</small>
+            </span>
+            <i class="fas fa-play"></i>
+        </button>`;
+}
+
+function loadTrackEmbed(card) {
+    const iframe = document.createElement('iframe');
+    iframe.src = `https://open.spotify.com/embed/track/${card.dataset.track}?utm_source=generator&autoplay=1`;
+    iframe.style.cssText = 'width:100%; height:80px; border:none; border-radius:12px; display:block; margin-bottom:15px;';
+    iframe.allow = 'autoplay; clipboard-write; encrypted-media; fullscreen; picture-in-picture';
+    card.replaceWith(iframe);
+}
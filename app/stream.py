@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import queue
+import select
+import threading
+import psycopg2
+from app import changes
+from app.db import primary_dsn
+
+# update pin live: tiap worker punya SATU koneksi LISTEN ke primary (bukan replica,
+# NOTIFY gak ikut ke-replikasi). event dari worker/instance lain diterusin ke
+# changes.dispatch() (index, cluster, tile cache, heatmap ikut seger), dan semua event
+# (lokal maupun dari luar) disebar ke client SSE /api/entries/stream lewat Hub.
+#
+# tiap client SSE megang satu thread gunicorn selama nyambung, jadi jumlahnya dibatesin
+# per worker (LIVE_MAX_CLIENTS) & koneksinya diputus tiap LIVE_MAX_SECONDS biar gantian
+# (EventSource nyambung ulang sendiri). client yang antriannya penuh (kelambatan)
+# dikirimin `reset` terus diputus, bukan bikin antrian numpuk di memory.
+HEARTBEAT = 15
+RETRY_MS = 5000
+PING_EVERY = 60
+
+
+def compact(event):
+    # yang dikirim ke browser: tanpa user_id, key yang kosong gak ikut
+    out = {k: v for k, v in event.items() if k != 'user_id' and v is not None}
+    for key in ('lat', 'lon', 'old_lat', 'old_lon'):
+        if key in out:
+            out[key] = round(float(out[key]), 5)
+    return out
+
+
+class Client:
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(queue_size)
+        self.overflowed = False
+
+
+class Hub:
+    def __init__(self, max_clients=4, queue_size=100):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.stats = {'accepted': 0, 'rejected': 0, 'dropped': 0, 'sent': 0}
+
+    def connect(self):
+        with self.lock:
+            if len(self.clients) >= self.max_clients:
+                self.stats['rejected'] += 1
+                return None
+            client = Client(self.queue_size)
+            self.clients.add(client)
+            self.stats['accepted'] += 1
+            return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def broadcast(self, event):
+        # reset (write massal) dikirim apa adanya: peta ambil ulang semua tile di layar
+        if event['kind'] == 'reset':
+            frame = 'event: reset\ndata: {}\n\n'
+        else:
+            frame = f"event: change\ndata: {json.dumps(compact(event), separators=(',', ':'))}\n\n"
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            if client.overflowed:
+                continue
+            try:
+                client.queue.put_nowait(frame)
+            except queue.Full:
+                client.overflowed = True
+                self.stats['dropped'] += 1
+
+    def events(self, client, max_seconds):
+        # generator body text/event-stream buat satu client
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while time.monotonic() < deadline:
+                if client.overflowed:
+                    yield 'event: reset\ndata: {}\n\n'
+                    return
+                try:
+                    frame = client.queue.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                self.stats['sent'] += 1
+                yield frame
+        finally:
+            self.disconnect(client)
+
+
+hub = Hub(
+    int(os.environ.get('LIVE_MAX_CLIENTS', 4)),
+    int(os.environ.get('LIVE_QUEUE_SIZE', 100))
+)
+
+def max_seconds():
+    return float(os.environ.get('LIVE_MAX_SECONDS', 300))
+
+@changes.subscribe
+def _on_entry_change(event):
+    hub.broadcast(event)
+
+
+class Listener(threading.Thread):
+    def __init__(self, dsn):
+        super().__init__(name='entry-changes-listener', daemon=True)
+        self.dsn = dsn
+        self.stats = {'connects': 0, 'received': 0, 'applied': 0, 'errors': 0}
+        self.connected = False
+
+    def handle(self, payload):
+        self.stats['received'] += 1
+        data = json.loads(payload)
+        if data.get('origin') == changes.origin():
+            return  # udah di-publish lokal sama route yang nulis
+        for event in data.get('events', []):
+            changes.dispatch(event)
+            self.stats['applied'] += 1
+
+    def listen(self, conn):
+        cur = conn.cursor()
+        cur.execute(f'LISTEN {changes.CHANNEL}')
+        last = time.monotonic()
+        while True:
+            if select.select([conn], [], [], HEARTBEAT) == ([], [], []):
+                if time.monotonic() - last >= PING_EVERY:
+                    # koneksi idle tetep dicek, biar putusnya ketahuan & bisa nyambung ulang
+                    cur.execute('SELECT 1')
+                    last = time.monotonic()
+                continue
+            conn.poll()
+            last = time.monotonic()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    self.handle(notify.payload)
+                except Exception as e:
+                    print(f"Entry change listener error: {e}")
+
+    def run(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(connect_timeout=5, **self.dsn)
+                conn.autocommit = True
+                if self.stats['connects']:
+                    # sempet putus, event di antaranya mungkin kelewat: index, tile, & browser bangun ulang
+                    changes.publish_reset()
+                self.stats['connects'] += 1
+                self.connected = True
+                backoff = 1
+                self.listen(conn)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Entry change listener error: {e}")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+def enabled():
+    return os.environ.get('LIVE_UPDATES', '1') != '0'
+
+def ensure_listener():
+    # dipasang sebagai before_request: listener baru jalan di worker yang udah nerima request,
+    # bukan di master gunicorn / perintah CLI
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid() or not enabled():
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            _listener = Listener(primary_dsn())
+            _listener.start()
+            _listener_pid = os.getpid()
+
+def listener_stats():
+    if _listener is None or _listener_pid != os.getpid():
+        return None
+    return dict(_listener.stats, connected=_listener.connected)
@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+
+# resolusi nama tag -> id yang dipake add_entry & edit_entry.
+# semua nama di-upsert sekali jalan, link ke entry juga satu INSERT multi-row,
+# dan nama yang sering dipake disimpen di cache LRU per worker.
+
+
+class TagCache:
+    def __init__(self, max_items=5000):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get_many(self, names):
+        found = {}
+        with self.lock:
+            for name in names:
+                tid = self.items.get(name)
+                if tid is not None:
+                    self.items.move_to_end(name)
+                    found[name] = tid
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(names) - len(found)
+        return found
+
+    def put_many(self, mapping):
+        with self.lock:
+            for name, tid in mapping.items():
+                self.items[name] = tid
+                self.items.move_to_end(name)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+cache = TagCache(int(os.environ.get('TAG_CACHE_SIZE', 5000)))
+
+
+def parse(raw):
+    # "kopi, senja , hujan deras" -> ['kopi', 'senja', 'hujanderas'] (tanpa spasi, tanpa dobel)
+    names = [x.replace(' ', '') for x in (raw or '').split(',') if x.strip()]
+    return list(dict.fromkeys(n for n in names if n))
+
+def resolve(cur, names):
+    # -> {name: id}. tag yang belum ada dibikin di statement yang sama
+    ids = cache.get_many(names)
+    missing = [n for n in names if n not in ids]
+    if not missing:
+        return ids
+
+    cur.execute('''
+        WITH ins AS (
+            INSERT INTO tags (name) SELECT unnest(%s::text[])
+            ON CONFLICT (name) DO NOTHING
+            RETURNING id, name
+        )
+        SELECT id, name, true AS created FROM ins
+        UNION ALL
+        SELECT id, name, false AS created FROM tags WHERE name = ANY(%s)
+    ''', (missing, missing))
+    rows = cur.fetchall()
+
+    # tag bikinan transaksi ini belum ke-commit, jadi belum boleh masuk cache
+    cache.put_many({r['name']: r['id'] for r in rows if not r['created']})
+    ids.update({r['name']: r['id'] for r in rows})
+
+    # tag yang barusan di-insert transaksi lain belum keliatan di snapshot tadi
+    still_missing = [n for n in missing if n not in ids]
+    if still_missing:
+        cur.execute('SELECT id, name FROM tags WHERE name = ANY(%s)', (still_missing,))
+        for r in cur.fetchall():
+            ids[r['name']] = r['id']
+    return ids
+
+def link(cur, entry_id, tag_ids):
+    if tag_ids:
+        cur.execute('''
+            INSERT INTO entry_tags (entry_id, tag_id) SELECT %s, unnest(%s::int[])
+            ON CONFLICT DO NOTHING
+        ''', (entry_id, list(tag_ids)))
+
+def set_entry_tags(cur, entry_id, names):
+    # cuma nambah/hapus tag yang beneran berubah
+    wanted = set(resolve(cur, names).values())
+    cur.execute('SELECT tag_id FROM entry_tags WHERE entry_id = %s', (entry_id,))
+    current = {r['tag_id'] for r in cur.fetchall()}
+
+    removed = current - wanted
+    if removed:
+        cur.execute('DELETE FROM entry_tags WHERE entry_id = %s AND tag_id = ANY(%s)', (entry_id, list(removed)))
+    link(cur, entry_id, wanted - current)
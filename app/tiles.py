@@ -0,0 +1,184 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from app import changes, cluster
+
+MAX_ZOOM = 18
+FORMAT = 3  # naikin kalau isi tile / format file berubah, biar file lama di disk gak kepake
+
+
+def tile_bounds(z, x, y):
+    # -> (min_lon, min_lat, max_lon, max_lat) buat tile XYZ
+    n = 2 ** z
+    north, west = cluster.unproject(x / n, y / n)
+    south, east = cluster.unproject((x + 1) / n, (y + 1) / n)
+    return west, south, east, north
+
+def in_tile(z, x, y, lat, lon):
+    n = 2 ** z
+    px, py = cluster.project(lat, lon)
+    return min(int(px * n), n - 1) == x and min(int(py * n), n - 1) == y
+
+def tiles_for_point(lat, lon, cluster_zoom):
+    # tile yang kena kalau ada titik berubah di (lat, lon). di zoom yang di-cluster,
+    # centroid sel cluster bisa geser ke tile tetangga, jadi semua tile yang
+    # ketimpa sel itu ikut di-invalidate.
+    px, py = cluster.project(lat, lon)
+    out = []
+    for z in range(MAX_ZOOM + 1):
+        n = 2 ** z
+        if z <= cluster_zoom:
+            size = cluster.cell_size(z)
+            cx, cy = int(px / size), int(py / size)
+            x0, x1 = int(cx * size * n), min(int((cx + 1) * size * n), n - 1)
+            y0, y1 = int(cy * size * n), min(int((cy + 1) * size * n), n - 1)
+            out.extend((z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        else:
+            out.append((z, min(int(px * n), n - 1), min(int(py * n), n - 1)))
+    return out
+
+
+class TileCache:
+    # LRU di memori + file di disk (dishare antar worker di mesin yang sama).
+    # entri memori nyimpen mtime file-nya, jadi kalau worker lain hapus/ganti file,
+    # cache memori di sini ikut dianggap basi.
+    # baris pertama file = built_at index yang dipake bikin tile itu. get() nolak tile dari
+    # index yang lebih tua dari min_built, jadi tile yang kelewat event invalidasi
+    # (listener mati, LIVE_UPDATES=0) paling lama basi satu MAP_INDEX_TTL.
+    def __init__(self, directory, max_items=2048):
+        self.directory = directory
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def _path(self, z, x, y):
+        return os.path.join(self.directory, f'v{FORMAT}', str(z), str(x), f'{y}.json')
+
+    def get(self, key, min_built=0):
+        path = self._path(*key)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item[2] == mtime and item[3] >= min_built:
+                self.items.move_to_end(key)
+                self.stats['hits'] += 1
+                return item[0], item[1]
+
+        if mtime is not None:
+            try:
+                with open(path, 'rb') as f:
+                    stamp, _, body = f.read().partition(b'\n')
+                built = float(stamp)
+            except (OSError, ValueError):
+                built = None
+            if built is not None and built >= min_built:
+                etag = hashlib.sha1(body).hexdigest()
+                self._remember(key, body, etag, mtime, built)
+                self.stats['disk_hits'] += 1
+                return body, etag
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key, body, built):
+        etag = hashlib.sha1(body).hexdigest()
+        path = self._path(*key)
+        mtime = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(f'{built:.6f}\n'.encode() + body)
+            os.replace(tmp, path)
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            print(f"Tile cache write error: {e}")
+        self._remember(key, body, etag, mtime, built)
+        return etag
+
+    def _remember(self, key, body, etag, mtime, built):
+        with self.lock:
+            self.items[key] = (body, etag, mtime, built)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                self.items.pop(key, None)
+        for key in keys:
+            try:
+                os.remove(self._path(*key))
+                self.stats['invalidated'] += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                directory = os.environ.get('TILE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'mouthings-tiles')
+                _cache = TileCache(directory, int(os.environ.get('TILE_CACHE_SIZE', 2048)))
+    return _cache
+
+def tile_content(z, x, y, index, limit):
+    # -> (cluster yang centroid-nya di tile ini, id entry satuan di tile ini)
+    bbox = [tile_bounds(z, x, y)]
+    clusters = []
+    if z <= cluster.max_zoom():
+        cells, singles = cluster.get_clusters(index).query(bbox, z)
+        for c in cells:
+            # sel cluster bisa nyebrang batas tile, yang dihitung cuma yang centroid-nya di sini
+            if not in_tile(z, x, y, c['latitude'], c['longitude']):
+                continue
+            clusters.append({
+                'id': c['id'], 'count': c['count'], 'pin_color': c['pin_color'],
+                'latitude': round(c['latitude'], 5), 'longitude': round(c['longitude'], 5)
+            })
+        ids = sorted(singles, reverse=True)
+    else:
+        ids, _ = index.query(bbox, None)
+
+    points = index.points
+    ids = [i for i in ids if i in points and in_tile(z, x, y, points[i][0], points[i][1])]
+    return clusters, ids[:limit]
+
+# waktu terakhir nerima reset: tile dari index yang lebih tua dari ini ditolak,
+# termasuk yang ditulis worker lain yang belum nerima reset-nya
+_reset_at = 0
+
+def min_built(ttl):
+    return max(time.time() - ttl, _reset_at)
+
+@changes.subscribe
+def _on_entry_change(event):
+    global _reset_at
+    if event['kind'] == 'reset':
+        _reset_at = time.time()
+        return
+    if _cache is None:
+        return
+    cluster_zoom = cluster.max_zoom()
+    keys = set()
+    for lat, lon in ((event['lat'], event['lon']), (event.get('old_lat'), event.get('old_lon'))):
+        if lat is not None and lon is not None:
+            keys.update(tiles_for_point(float(lat), float(lon), cluster_zoom))
+    _cache.invalidate(keys)
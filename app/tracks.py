@@ -0,0 +1,131 @@
+import time
+import click
+from flask.cli import with_appcontext
+from app import spotify, pagecache
+
+# metadata lagu spotify disimpen sekali di spotify_tracks (key: track id), entries cuma
+# nyimpen spotify_track_id-nya. map & gallery tinggal join ke tabel ini buat nampilin
+# kartu lagu, gak perlu nanya spotify lagi dan iframe embed baru dimuat kalau diklik.
+SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS spotify_tracks (
+    track_id VARCHAR(64) PRIMARY KEY,
+    name TEXT,
+    artist TEXT,
+    album TEXT,
+    image_url TEXT,
+    duration_ms INTEGER,
+    missing BOOLEAN NOT NULL DEFAULT false,
+    fetched_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE entries ADD COLUMN IF NOT EXISTS spotify_track_id VARCHAR(64);
+CREATE INDEX IF NOT EXISTS entries_spotify_track_idx ON entries (spotify_track_id) WHERE spotify_track_id IS NOT NULL;
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO spotify_tracks (track_id, name, artist, album, image_url, duration_ms, missing)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (track_id) DO UPDATE SET
+        name = EXCLUDED.name, artist = EXCLUDED.artist, album = EXCLUDED.album,
+        image_url = EXCLUDED.image_url, duration_ms = EXCLUDED.duration_ms,
+        missing = EXCLUDED.missing, fetched_at = now()
+'''
+
+BATCH = 50  # batas endpoint /tracks?ids=
+
+
+def install(cur):
+    cur.execute(SCHEMA_SQL)
+
+def _row(track_id, track):
+    if track is None:
+        return (track_id, None, None, None, None, None, True)
+    return (track_id, track['name'], track['artist'], track.get('album'),
+            track['image'] or None, track.get('duration_ms'), False)
+
+def store(cur, tracks):
+    # tracks: {track_id: dict dari spotify atau None (gak ketemu)}
+    for track_id, track in tracks.items():
+        cur.execute(UPSERT_SQL, _row(track_id, track))
+
+def prepare(cur, url):
+    # dipanggil SEBELUM entry-nya ditulis. -> (track id atau None, metadata yang perlu disimpen).
+    # kalau metadatanya belum ada, ambil sekali dari spotify; kalau spotify lagi error
+    # entry tetep kesimpen, nanti dilengkapin sama tracks-backfill.
+    # transaksi baca-nya ditutup dulu sebelum nanya spotify, biar request yang lambat
+    # gak bikin koneksi nyangkut "idle in transaction".
+    track_id = spotify.track_id(url)
+    if not track_id:
+        return None, {}
+
+    cur.execute('SELECT 1 FROM spotify_tracks WHERE track_id = %s', (track_id,))
+    known = cur.fetchone() is not None
+    cur.connection.rollback()
+    if known:
+        return track_id, {}
+    try:
+        found = spotify.lookup(url)
+    except Exception as e:
+        print(f"Spotify track lookup error: {e}")
+        return track_id, {}
+    return track_id, {track_id: found[0] if found else None}
+
+def remember(cur, prepared):
+    # di dalam transaksi write: simpen metadata hasil prepare() -> track id buat entries
+    track_id, fetched = prepared
+    store(cur, fetched)
+    return track_id
+
+
+@click.command('tracks-backfill')
+@click.option('--rate', default=2.0, help='Maksimal request ke Spotify per detik.')
+@click.option('--retry-missing', is_flag=True, help='Coba lagi track yang sebelumnya gak ketemu.')
+@with_appcontext
+def backfill_command(rate, retry_missing):
+    """Isi spotify_track_id & metadata lagu buat entry lama."""
+    from app.db import get_db
+    conn, cur = get_db()
+    install(cur)
+    cur.execute('''
+        UPDATE entries SET spotify_track_id = substring(spotify_url from 'track[/:]([a-zA-Z0-9]+)')
+        WHERE spotify_track_id IS NULL AND spotify_url LIKE '%track%'
+    ''')
+    linked = cur.rowcount
+    conn.commit()
+
+    cur.execute('''
+        SELECT DISTINCT e.spotify_track_id AS track_id
+        FROM entries e
+        LEFT JOIN spotify_tracks st ON st.track_id = e.spotify_track_id
+        WHERE e.spotify_track_id IS NOT NULL AND (st.track_id IS NULL OR (%s AND st.missing))
+    ''', (retry_missing,))
+    pending = [row['track_id'] for row in cur.fetchall()]
+    click.echo(f'{linked} entries linked, {len(pending)} tracks to fetch')
+
+    if pending and spotify.get_token_manager() is None:
+        click.echo('SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET belum diset, metadata dilewati')
+        return
+
+    done = 0
+    interval = 1.0 / rate if rate > 0 else 0
+    i = 0
+    while i < len(pending):
+        batch = pending[i:i + BATCH]
+        started = time.monotonic()
+        try:
+            store(cur, spotify.fetch_tracks(batch))
+            # kartu lagu di popup entry yang pake track ini ikut berubah
+            cur.execute('UPDATE entries SET version = version + 1 WHERE spotify_track_id = ANY(%s)', (batch,))
+        except spotify.RateLimited as e:
+            click.echo(f'rate limited, nunggu {e.retry_after:.0f}s')
+            time.sleep(e.retry_after)
+            continue
+        conn.commit()
+        done += len(batch)
+        i += BATCH
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+    if done or linked:
+        # gallery di home ke-cache per generation, biar kartu lagunya langsung keisi
+        pagecache.bump(cur)
+        conn.commit()
+    click.echo(f'{done} tracks stored')
@@ -0,0 +1,2 @@
+# benchmark app: PostgreSQL sementara + mock Spotify + campuran traffic yang mirip aslinya.
+# jalanin: python -m bench --sizes 1000,10000 --duration 20
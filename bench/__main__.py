@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import psycopg2
+from bench import seed
+from bench.pg import Postgres
+from bench.mock_spotify import MockSpotify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def prepare(pg, size, seed_value):
+    name = f'mouthings_bench_{size}'
+    params = pg.create_database(name)
+    conn = psycopg2.connect(**params)
+    started = time.monotonic()
+    gen = seed.Generator(users=max(10, size // 20), entries=size, tags=max(50, size // 50),
+                         tracks=max(20, size // 10), seed=seed_value)
+    seed.load(conn, gen, log=lambda msg: None)
+    conn.close()
+    return name, gen.users, time.monotonic() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmark latency app di beberapa ukuran dataset.')
+    parser.add_argument('--sizes', default='1000,10000', help='Jumlah entry per dataset, dipisah koma.')
+    parser.add_argument('--duration', type=float, default=20, help='Detik pengukuran per dataset.')
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--concurrency', type=int, default=8, help='Jumlah virtual user barengan.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--spotify-latency', type=float, default=0.08, help='Latency mock Spotify (detik).')
+    parser.add_argument('--out', help='File JSON hasil (default bench/results/<commit>.json).')
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    out = args.out or os.path.join(ROOT, 'bench', 'results', f'{commit}.json')
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+
+    pg = Postgres().start()
+    spotify = MockSpotify(latency=args.spotify_latency).start()
+    results = []
+    try:
+        for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+            dbname, users, seed_secs = prepare(pg, size, args.seed)
+            print(f'[{size}] dataset siap ({users} user, {seed_secs:.1f}s), ngukur {args.duration:.0f}s...', flush=True)
+
+            with tempfile.TemporaryDirectory(prefix='mouthings-bench-') as tmp:
+                env = dict(os.environ, **pg.env(dbname), **spotify.env(),
+                           TILE_CACHE_DIR=os.path.join(tmp, 'tiles'),
+                           SPOTIFY_TOKEN_CACHE=os.path.join(tmp, 'token.json'))
+                part = os.path.join(tmp, 'result.json')
+                before = dict(spotify.counts)
+                subprocess.run([sys.executable, '-m', 'bench.runner', '--size', str(size), '--users', str(users),
+                                '--duration', str(args.duration), '--warmup', str(args.warmup),
+                                '--concurrency', str(args.concurrency), '--seed', str(args.seed), '--out', part],
+                               cwd=ROOT, env=env, check=True)
+                with open(part) as f:
+                    result = json.load(f)
+
+            result['seed_seconds'] = round(seed_secs, 2)
+            result['spotify_upstream'] = {k: v - before.get(k, 0) for k, v in spotify.counts.items()}
+            results.append(result)
+            total = result['total']
+            print(f"[{size}] {total['rps']} req/s  p50 {total['p50_ms']}ms  p95 {total['p95_ms']}ms  p99 {total['p99_ms']}ms", flush=True)
+    finally:
+        spotify.stop()
+        pg.stop()
+
+    report = {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'config': vars(args),
+        'results': results
+    }
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'hasil: {out}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
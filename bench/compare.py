@@ -0,0 +1,42 @@
+import sys
+import json
+import argparse
+
+# bandingin dua file hasil benchmark: python -m bench.compare lama.json baru.json
+METRICS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_avg', 'bytes_avg')
+
+
+def _delta(old, new):
+    if old in (None, 0) or new is None:
+        return ''
+    return f'{(new - old) / old * 100:+.1f}%'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.compare')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    old_by_size = {r['size']: r for r in old['results']}
+
+    print(f"{old['commit']} -> {new['commit']}")
+    for result in new['results']:
+        before = old_by_size.get(result['size'])
+        if before is None:
+            continue
+        print(f"\n== {result['size']} entries ==")
+        print(f"{'endpoint':<18}" + ''.join(f'{m:>22}' for m in METRICS))
+        rows = dict(result['endpoints'], total=result['total'])
+        old_rows = dict(before['endpoints'], total=before['total'])
+        for name, stats in rows.items():
+            prev = old_rows.get(name, {})
+            cells = ''.join(f"{str(stats.get(m)):>12}{_delta(prev.get(m), stats.get(m)):>10}" for m in METRICS)
+            print(f'{name:<18}{cells}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import json
+import hashlib
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def fake_track(track_id):
+    rng = random.Random(track_id)
+    return {
+        'id': track_id,
+        'name': f'Lagu {track_id[:6]}',
+        'artists': [{'name': f'Artis {rng.randint(1, 500)}'}],
+        'album': {
+            'name': f'Album {rng.randint(1, 200)}',
+            'images': [{'url': f'https://i.scdn.co/image/{track_id}-640'}, {'url': f'https://i.scdn.co/image/{track_id}-300'}]
+        },
+        'duration_ms': rng.randint(120000, 300000),
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'}
+    }
+
+
+class MockSpotify:
+    # server HTTP lokal yang niru token endpoint + /v1/search + /v1/tracks spotify.
+    # latency diset biar keliatan efek cache/pool; request dihitung per path.
+    def __init__(self, latency=0.08):
+        self.latency = latency
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def env(self):
+        return {
+            'SPOTIFY_CLIENT_ID': 'bench',
+            'SPOTIFY_CLIENT_SECRET': 'bench',
+            'SPOTIFY_TOKEN_URL': self.base + '/api/token',
+            'SPOTIFY_API_URL': self.base + '/v1'
+        }
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='mock-spotify', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _count(self, path):
+                with mock.lock:
+                    mock.counts[path] = mock.counts.get(path, 0) + 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._count('token')
+                self._send(200, {'access_token': 'bench-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                time.sleep(mock.latency)
+                if url.path == '/v1/search':
+                    self._count('search')
+                    q = query.get('q', [''])[0]
+                    ids = [hashlib.sha1(f'{q}|{i}'.encode()).hexdigest()[:22] for i in range(int(query.get('limit', ['5'])[0]))]
+                    self._send(200, {'tracks': {'items': [fake_track(i) for i in ids]}})
+                elif url.path == '/v1/tracks':
+                    self._count('tracks')
+                    ids = query.get('ids', [''])[0].split(',')
+                    self._send(200, {'tracks': [fake_track(i) for i in ids if i]})
+                elif url.path.startswith('/v1/tracks/'):
+                    self._count('track')
+                    self._send(200, fake_track(url.path.rsplit('/', 1)[-1]))
+                else:
+                    self._send(404, {'error': {'status': 404}})
+
+        return Handler
@@ -0,0 +1,90 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import psycopg2
+from psycopg2 import extensions, sql
+
+
+class Postgres:
+    # cluster PostgreSQL sementara buat benchmark.
+    # - BENCH_DATABASE_URL diset: pake server itu, tiap dataset dapet database baru yang di-drop di akhir
+    # - gak diset: initdb ke folder temp + pg_ctl start di port random, dihapus semua waktu stop()
+    def __init__(self, url=None):
+        self.url = url or os.environ.get('BENCH_DATABASE_URL')
+        self.datadir = None
+        self.params = None
+        self.created = []
+
+    def start(self):
+        if self.url:
+            self.params = extensions.parse_dsn(self.url)
+            return self
+
+        initdb = shutil.which('initdb')
+        if initdb is None:
+            raise RuntimeError('initdb gak ketemu di PATH, set BENCH_DATABASE_URL ke server PostgreSQL yang boleh diacak-acak')
+        bindir = os.path.dirname(initdb)
+        self.datadir = tempfile.mkdtemp(prefix='mouthings-bench-pg-')
+        port = _free_port()
+        subprocess.run([initdb, '-D', self.datadir, '-U', 'bench', '--auth=trust', '-E', 'UTF8'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([os.path.join(bindir, 'pg_ctl'), '-D', self.datadir, '-w', '-l', os.path.join(self.datadir, 'log'),
+                        '-o', f'-p {port} -k {self.datadir} -c fsync=off -c synchronous_commit=off', 'start'],
+                       check=True, stdout=subprocess.DEVNULL)
+        self.params = {'host': '127.0.0.1', 'port': str(port), 'user': 'bench', 'dbname': 'postgres'}
+        return self
+
+    def create_database(self, name):
+        conn = psycopg2.connect(**self.params)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(name)))
+            cur.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(name)))
+        conn.close()
+        self.created.append(name)
+        return dict(self.params, dbname=name)
+
+    def env(self, dbname):
+        # env DB_* yang dibaca app/db.py
+        return {
+            'DB_NAME': dbname,
+            'DB_USER': self.params.get('user', ''),
+            'DB_PASS': self.params.get('password', ''),
+            'DB_HOST': self.params.get('host', ''),
+            'DB_PORT': self.params.get('port', '5432')
+        }
+
+    def stop(self):
+        if self.datadir:
+            bindir = os.path.dirname(shutil.which('initdb'))
+            subprocess.run([os.path.join(bindir, 'pg_ctl'), '-D', self.datadir, '-m', 'fast', 'stop'],
+                           stdout=subprocess.DEVNULL)
+            shutil.rmtree(self.datadir, ignore_errors=True)
+            return
+
+        conn = psycopg2.connect(**self.params)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for name in self.created:
+                cur.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(name)))
+        conn.close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_ready(params, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            psycopg2.connect(**params).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
@@ -0,0 +1,110 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+# satu putaran benchmark buat satu dataset. dijalanin di proses sendiri (lihat bench/__main__.py)
+# biar cache in-process app (index peta, pagecache, tag cache) gak kebawa antar ukuran dataset.
+
+_local = threading.local()
+
+
+def _install_query_counter():
+    # hitung query per request: cursor dari get_db() diganti subclass yang ngitung execute()
+    import app.db
+    base = app.db.QueryCursor
+
+    class CountingCursor(base):
+        def execute(self, query, vars=None):
+            _local.queries = getattr(_local, 'queries', 0) + 1
+            return super().execute(query, vars)
+
+    app.db.QueryCursor = CountingCursor
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def summarize(samples, elapsed):
+    latencies = [s[0] for s in samples]
+    return {
+        'count': len(samples),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if samples else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if samples else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if samples else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if samples else None,
+        'bytes_avg': round(sum(s[1] for s in samples) / len(samples)) if samples else None,
+        'queries_avg': round(sum(s[2] for s in samples) / len(samples), 2) if samples else None,
+        'errors': sum(1 for s in samples if s[3] >= 500)
+    }
+
+def run(size, users, duration, warmup, concurrency, seed):
+    from app import create_app
+    from bench import scenarios
+    _install_query_counter()
+    app = create_app()
+
+    samples = {}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + warmup + duration
+    record_from = time.monotonic() + warmup
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        client = app.test_client()
+        anon = app.test_client()
+        username = f'user{rng.randrange(users)}'
+        scenarios.login(client, username)
+
+        def req(name, method, url, anonymous=False, **kwargs):
+            _local.queries = 0
+            started = time.perf_counter()
+            resp = (anon if anonymous else client).open(url, method=method, **kwargs)
+            body = resp.get_data()
+            latency = time.perf_counter() - started
+            if time.monotonic() >= record_from:
+                with lock:
+                    samples.setdefault(name, []).append((latency, len(body), _local.queries, resp.status_code))
+
+        while time.monotonic() < stop_at:
+            scenarios.pick(rng)(req, rng, username)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    everything = [s for rows in samples.values() for s in rows]
+    return {
+        'size': size,
+        'endpoints': {name: summarize(rows, duration) for name, rows in sorted(samples.items())},
+        'total': summarize(everything, duration)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, required=True)
+    parser.add_argument('--users', type=int, required=True)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args(argv)
+
+    result = run(args.size, args.users, args.duration, args.warmup, args.concurrency, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(result, f)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+from bench.seed import WORDS, CITIES, BENCH_PASSWORD
+
+# campuran traffic. tiap skenario dapet (client, rng, user) dan manggil req(name, method, url, **kw)
+# buat tiap request yang mau diukur. bobot = perbandingan seberapa sering dipilih.
+TYPEAHEAD = ['kopi senja', 'hujan di kota', 'lagu pulang', 'malam minggu']
+
+
+def home_anon(req, rng, user):
+    req('home_anon', 'GET', '/', anonymous=True)
+
+def search(req, rng, user):
+    req('search', 'GET', '/', query_string={'q': ' '.join(rng.sample(WORDS, rng.randint(1, 2)))}, anonymous=True)
+
+def sidebar(req, rng, user):
+    req('home_logged_in', 'GET', '/')
+
+def map_view(req, rng, user):
+    _, lat, lon, _ = rng.choice(CITIES)
+    zoom = rng.choice([5, 9, 12, 15])
+    span = 40 / 2 ** zoom * 10
+    bbox = f'{lon - span},{lat - span / 2},{lon + span},{lat + span / 2}'
+    req('map_entries', 'GET', '/api/entries', query_string={'bbox': bbox, 'zoom': zoom}, anonymous=True)
+
+def add_entry(req, rng, user):
+    _, lat, lon, _ = rng.choice(CITIES)
+    req('add_entry', 'POST', '/add_entry', data={
+        'title': ' '.join(rng.choices(WORDS, k=3)),
+        'description': ' '.join(rng.choices(WORDS, k=30)),
+        'tags': ', '.join(f'{w}{rng.randint(0, 400)}' for w in rng.choices(WORDS, k=15)),
+        'spotify_link': f'https://open.spotify.com/track/{rng.getrandbits(64):016x}',
+        'pin_color': '#ff4757',
+        'latitude': lat + rng.gauss(0, 0.1),
+        'longitude': lon + rng.gauss(0, 0.1)
+    })
+
+def spotify_typeahead(req, rng, user):
+    # ngetik huruf per huruf, tiap ketikan (mulai 2 huruf) nembak /spotify_search
+    text = rng.choice(TYPEAHEAD)
+    for n in range(2, len(text) + 1):
+        req('spotify_search', 'GET', '/spotify_search', query_string={'q': text[:n]})
+
+
+MIX = {
+    home_anon: 30,
+    search: 15,
+    sidebar: 15,
+    map_view: 20,
+    add_entry: 5,
+    spotify_typeahead: 15
+}
+
+def pick(rng):
+    return rng.choices(list(MIX), weights=list(MIX.values()))[0]
+
+def login(client, username):
+    resp = client.post('/login', data={'username': username, 'password': BENCH_PASSWORD})
+    if resp.status_code != 302:
+        raise RuntimeError(f'login {username} gagal: {resp.status_code}')
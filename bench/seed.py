@@ -0,0 +1,256 @@
+import io
+import os
+import sys
+import time
+import bisect
+import random
+import hashlib
+import argparse
+import datetime
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from app import counters, migrations, search
+
+# generator dataset sintetis buat uji skala (jutaan baris), deterministik dari seed.
+# skema dari app/migrations.py. semua tabel dialirin pake COPY ... FROM STDIN dari generator, jadi memori tetep kecil.
+# id diisi sendiri (1..N) biar entry_tags bisa langsung nunjuk tanpa bolak-balik ke DB.
+
+# kota + bobot kira-kira (makin gede makin rame pin-nya)
+CITIES = [
+    ('jakarta', -6.2088, 106.8456, 30), ('bandung', -6.9175, 107.6191, 12),
+    ('surabaya', -7.2575, 112.7521, 10), ('yogyakarta', -7.7956, 110.3695, 9),
+    ('medan', 3.5952, 98.6722, 6), ('denpasar', -8.6705, 115.2126, 6),
+    ('makassar', -5.1477, 119.4327, 4), ('semarang', -6.9667, 110.4167, 5),
+    ('malang', -7.9666, 112.6326, 4), ('singapore', 1.3521, 103.8198, 3),
+    ('kuala lumpur', 3.1390, 101.6869, 2), ('tokyo', 35.6762, 139.6503, 1),
+    ('amsterdam', 52.3676, 4.9041, 1), ('melbourne', -37.8136, 144.9631, 1)
+]
+COLORS = ['#ff4757', '#2ed573', '#1e90ff', '#ffa502', '#a55eea', '#ff6b81', '#eccc68', '#70a1ff']
+WORDS = ('kopi senja hujan rindu pulang jalan malam pagi laut kota kampus kereta teman mantan '
+         'lagu kenangan motor warung angin langit bintang gerimis stasiun terminal pantai gunung '
+         'sahabat kost skripsi wisuda macet ojol bakso martabak hati sepi ramai janji pelukan').split()
+BENCH_PASSWORD = 'bench-password'
+KM_PER_DEG = 111.0
+
+
+def password_hash(password, seed):
+    # hash format werkzeug (scrypt default), salt-nya dari seed biar output-nya byte-per-byte sama
+    salt = hashlib.sha1(f'mouthings-seed-{seed}'.encode()).hexdigest()[:16]
+    n, r, p = 2 ** 15, 8, 1
+    digest = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=132 * n * r * p).hex()
+    return f'scrypt:{n}:{r}:{p}${salt}${digest}'
+
+
+class Zipf:
+    # sampler rank^-s: dikit item yang populer banget, sisanya ekor panjang. s=0 -> uniform
+    def __init__(self, n, s):
+        total = 0.0
+        self.cum = []
+        for rank in range(1, n + 1):
+            total += rank ** -s
+            self.cum.append(total)
+        self.total = total
+
+    def sample(self, rng):
+        return bisect.bisect_left(self.cum, rng.random() * self.total)
+
+
+class CopySource(io.TextIOBase):
+    # file-like buat copy_expert: baca baris dari generator sesuai ukuran yang diminta
+    def __init__(self, lines):
+        self.lines = lines
+        self.buf = ''
+        self.rows = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        chunks, length = [self.buf], len(self.buf)
+        while size < 0 or length < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            chunks.append(line)
+            length += len(line)
+            self.rows += 1
+        data = ''.join(chunks)
+        if size < 0:
+            self.buf = ''
+            return data
+        self.buf = data[size:]
+        return data[:size]
+
+
+def _tsv(*values):
+    return '\t'.join('\\N' if v is None else str(v) for v in values) + '\n'
+
+def track_id(n):
+    return hashlib.sha1(f'track-{n}'.encode()).hexdigest()[:22]
+
+
+class Generator:
+    def __init__(self, users, entries, tags, tracks, seed=42, user_skew=1.1, tag_skew=1.0, track_skew=0.9,
+                 max_tags=5, spotify_ratio=0.6, image_ratio=0.3, active_ratio=0.95, spread_km=8.0,
+                 days=730, until=datetime.datetime(2026, 1, 1)):
+        if users < 1:
+            raise ValueError('butuh minimal 1 user')
+        self.users, self.entries, self.tags, self.tracks = users, entries, tags, tracks
+        self.seed = seed
+        self.user_skew, self.tag_skew, self.track_skew = user_skew, tag_skew, track_skew
+        self.max_tags = max_tags
+        self.spotify_ratio, self.image_ratio, self.active_ratio = spotify_ratio, image_ratio, active_ratio
+        self.spread_deg = spread_km / KM_PER_DEG
+        self.until = until
+        self.span = datetime.timedelta(days=days).total_seconds()
+
+    def _rng(self, table):
+        # tiap tabel punya stream sendiri, jadi nambah --entries gak ngubah isi tabel users
+        return random.Random(f'{self.seed}:{table}')
+
+    def user_rows(self):
+        pw = password_hash(BENCH_PASSWORD, self.seed)
+        rng = self._rng('users')
+        for i in range(self.users):
+            pic = f'https://i.pravatar.cc/150?u={i}' if rng.random() < 0.5 else None
+            yield _tsv(i + 1, f'user{i}', pw, pic)
+
+    def tag_rows(self):
+        rng = self._rng('tags')
+        for i in range(self.tags):
+            name = WORDS[i] if i < len(WORDS) else f'{rng.choice(WORDS)}{rng.choice(WORDS)}{i}'
+            yield _tsv(i + 1, name)
+
+    def track_rows(self):
+        rng = self._rng('tracks')
+        for i in range(self.tracks):
+            tid = track_id(i)
+            yield _tsv(tid, f'{rng.choice(WORDS).title()} {rng.choice(WORDS)}', f'Artis {rng.randint(1, max(1, self.tracks // 8))}',
+                       f'Album {rng.randint(1, max(1, self.tracks // 4))}', f'https://i.scdn.co/image/{tid}',
+                       rng.randint(90000, 360000), 'f')
+
+    def entry_rows(self):
+        rng = self._rng('entries')
+        authors = Zipf(self.users, self.user_skew)
+        songs = Zipf(self.tracks, self.track_skew) if self.tracks else None
+        city_weights = [c[3] for c in CITIES]
+        for i in range(self.entries):
+            _, lat, lon, _ = rng.choices(CITIES, weights=city_weights)[0]
+            lat = max(-85.0, min(85.0, rng.gauss(lat, self.spread_deg)))
+            lon = rng.gauss(lon, self.spread_deg)
+            # id naik = makin baru, kayak data asli; sedikit jitter biar gak terlalu rapi
+            age = self.span * (1 - (i + rng.random()) / self.entries)
+            created = self.until - datetime.timedelta(seconds=age)
+
+            tid = track_id(songs.sample(rng)) if songs and rng.random() < self.spotify_ratio else None
+            yield _tsv(
+                i + 1,
+                authors.sample(rng) + 1,
+                ' '.join(rng.choices(WORDS, k=rng.randint(2, 6))),
+                ' '.join(rng.choices(WORDS, k=int(rng.lognormvariate(3.0, 0.8)) + 1)),
+                f'https://picsum.photos/seed/{i}/600/400' if rng.random() < self.image_ratio else None,
+                None,
+                f'https://open.spotify.com/track/{tid}' if tid else None,
+                tid,
+                rng.choice(COLORS),
+                round(lat, 6),
+                round(lon, 6),
+                1 if rng.random() < self.active_ratio else 0,
+                created.isoformat(sep=' ')
+            )
+
+    def entry_tag_rows(self):
+        rng = self._rng('entry_tags')
+        popular = Zipf(self.tags, self.tag_skew) if self.tags else None
+        if popular is None:
+            return
+        for entry_id in range(1, self.entries + 1):
+            picked = {popular.sample(rng) + 1 for _ in range(rng.randint(0, self.max_tags))}
+            for tag_id in sorted(picked):
+                yield _tsv(entry_id, tag_id)
+
+
+TABLES = [
+    ('users', '(id, username, password, profile_pic)', 'user_rows'),
+    ('tags', '(id, name)', 'tag_rows'),
+    ('spotify_tracks', '(track_id, name, artist, album, image_url, duration_ms, missing)', 'track_rows'),
+    ('entries', '(id, user_id, title, description, image_url, gmaps_link, spotify_url, spotify_track_id, '
+                'pin_color, latitude, longitude, active, created_at)', 'entry_rows'),
+    ('entry_tags', '(entry_id, tag_id)', 'entry_tag_rows')
+]
+
+
+def load(conn, gen, reset=False, search_doc=True, log=print):
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    migrations.migrate(conn, cur, log=lambda msg: None)
+    if reset:
+        cur.execute('TRUNCATE entry_tags, entries, tags, users, spotify_tracks, user_stats, user_tag_uses RESTART IDENTITY')
+    cur.execute('SELECT (SELECT count(*) FROM users) + (SELECT count(*) FROM entries) AS n')
+    if cur.fetchone()['n']:
+        raise RuntimeError('tabel users/entries udah ada isinya, pake --reset buat ngosongin dulu')
+
+    # trigger counter dimatiin selama COPY, nanti dihitung ulang sekali lewat reconcile
+    cur.execute('ALTER TABLE entries DISABLE TRIGGER USER')
+    cur.execute('ALTER TABLE entry_tags DISABLE TRIGGER USER')
+    for table, columns, method in TABLES:
+        started = time.monotonic()
+        source = CopySource(getattr(gen, method)())
+        cur.copy_expert(f'COPY {table} {columns} FROM STDIN', source, size=65536)
+        log(f'{table}: {source.rows} rows ({time.monotonic() - started:.1f}s)')
+    cur.execute('ALTER TABLE entries ENABLE TRIGGER USER')
+    cur.execute('ALTER TABLE entry_tags ENABLE TRIGGER USER')
+    for table in ('users', 'tags', 'entries'):
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), greatest((SELECT max(id) FROM {table}), 1))")
+    conn.commit()
+
+    if search_doc:
+        started = time.monotonic()
+        search.backfill(cur, batch=50000, commit=conn.commit)
+        log(f'search_doc: {time.monotonic() - started:.1f}s')
+
+    counters.reconcile(cur)
+    conn.commit()
+    conn.autocommit = True
+    cur.execute('ANALYZE')
+    conn.autocommit = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.seed', description='Isi DB pake data sintetis (COPY).')
+    parser.add_argument('--dsn', help='Default: env DB_HOST/DB_NAME/DB_USER/DB_PASS/DB_PORT kayak app.')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--tags', type=int, default=2000)
+    parser.add_argument('--tracks', type=int, default=5000, help='Jumlah lagu unik yang dipake entry.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--user-skew', type=float, default=1.1, help='Eksponen zipf entry per user (0 = rata).')
+    parser.add_argument('--tag-skew', type=float, default=1.0)
+    parser.add_argument('--track-skew', type=float, default=0.9)
+    parser.add_argument('--max-tags', type=int, default=5, help='Maksimal tag per entry.')
+    parser.add_argument('--spotify-ratio', type=float, default=0.6)
+    parser.add_argument('--image-ratio', type=float, default=0.3)
+    parser.add_argument('--active-ratio', type=float, default=0.95)
+    parser.add_argument('--spread-km', type=float, default=8.0, help='Sebaran pin di sekitar pusat kota.')
+    parser.add_argument('--days', type=int, default=730, help='Rentang created_at ke belakang dari 2026-01-01.')
+    parser.add_argument('--reset', action='store_true', help='TRUNCATE tabel data dulu.')
+    parser.add_argument('--skip-search-doc', action='store_true', help='Lewati pengisian entries.search_doc.')
+    args = parser.parse_args(argv)
+
+    if args.dsn:
+        conn = psycopg2.connect(args.dsn)
+    else:
+        conn = psycopg2.connect(dbname=os.environ.get('DB_NAME'), user=os.environ.get('DB_USER'),
+                                password=os.environ.get('DB_PASS'), host=os.environ.get('DB_HOST'),
+                                port=os.environ.get('DB_PORT'))
+    gen = Generator(args.users, args.entries, args.tags, args.tracks, seed=args.seed,
+                    user_skew=args.user_skew, tag_skew=args.tag_skew, track_skew=args.track_skew,
+                    max_tags=args.max_tags, spotify_ratio=args.spotify_ratio, image_ratio=args.image_ratio,
+                    active_ratio=args.active_ratio, spread_km=args.spread_km, days=args.days)
+    started = time.monotonic()
+    load(conn, gen, reset=args.reset, search_doc=not args.skip_search_doc)
+    conn.close()
+    print(f'selesai dalam {time.monotonic() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    sys.exit(main())